@@ -20,9 +20,29 @@ app.conf.update(
 
 # Celery Beat Settings
 app.conf.beat_schedule = {
-    'send_reminder_email_daily_at_8pm_utc': {
+    'send_reminder_emails_hourly': {
         'task': 'journals.tasks.send_reminder_emails',
-        'schedule': crontab(hour=20, minute=00),  # Runs every day at 20:00 UTC
+        'schedule': crontab(minute=0),  # Runs every hour for the users whose reminder falls in it
+    },
+    'drain_outbox_every_minute': {
+        'task': 'journals.tasks.drain_outbox',
+        'schedule': 60.0,  # Picks up retries and anything a chunk task's own drain left behind
+    },
+    'purge_sent_emails_daily': {
+        'task': 'journals.tasks.purge_sent_emails',
+        'schedule': crontab(minute=15, hour=3),
+    },
+    'flush_recently_accessed_journals_every_minute': {
+        'task': 'journals.tasks.flush_recently_accessed_journals',
+        'schedule': 60.0,  # Only has work to do when RECENTLY_ACCESSED_JOURNALS_BUFFERED is on
+    },
+    'evict_entry_pdf_cache_every_five_minutes': {
+        'task': 'journals.tasks.evict_entry_pdf_cache',
+        'schedule': 5 * 60.0,  # The cache may outgrow ENTRY_PDF_CACHE_MAX_BYTES by what is rendered in between
+    },
+    'delete_expired_archive_exports_hourly': {
+        'task': 'journals.tasks.delete_expired_archive_exports',
+        'schedule': crontab(minute=30),
     },
 }
 
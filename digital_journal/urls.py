@@ -30,12 +30,19 @@ urlpatterns = [
     path('log_out/', views.log_out, name='log_out'),
     path('password/', views.PasswordView.as_view(), name='password'),
     path('profile/', views.ProfileUpdateView.as_view(), name='profile'),
+    path('profile/archive/', views.DownloadArchiveView.as_view(), name='download_archive'),
     path('sign_up/', views.SignUpView.as_view(), name='sign_up'),
 
     path('journals/', views.JournalsView.as_view(), name='journals_home'),
+    path('sidebar/journals/', views.SidebarJournalsView.as_view(), name='sidebar_journals'),
+    path('sidebar/journals/<int:journal_id>/entries/', views.SidebarEntriesView.as_view(), name='sidebar_entries'),
+    path('journals/suggestions/', views.SuggestionsView.as_view(), name='suggestions'),
+    path('journals/search/', views.SearchEntriesView.as_view(), name='search_entries'),
     path('journals/create_journal/', views.CreateJournalView.as_view(), name='create_journal'),
     path('journals/<int:journal_id>/entries', views.EntriesView.as_view(), name='view_journal_entries'),
     path('journals/<int:journal_id>/download_journal_pdf', views.DownloadJournalPDF.as_view(), name='download_journal_pdf'),
+    path('journals/<int:journal_id>/exports/<int:export_id>/', views.JournalExportView.as_view(), name='journal_export'),
+    path('journals/<int:journal_id>/exports/<int:export_id>/download', views.DownloadJournalExportView.as_view(), name='download_journal_export'),
     path('journals/<int:journal_id>/create_entry', views.CreateEntryView.as_view(), name='create_entry'),
     path('journals/<int:journal_id>/entries/<int:entry_id>/edit', views.EditEntryView.as_view(), name='edit_entry'),
     path('journals/<int:journal_id>/entries/<int:entry_id>/view', views.ViewEntryView.as_view(), name='view_entry'),
@@ -0,0 +1,50 @@
+"""In-process registry of the achievements listed in ACHIEVEMENT_LEVELS."""
+from journals.models import ACHIEVEMENT_LEVELS, Achievement, CacheVersion
+
+ACHIEVEMENTS_CACHE_VERSION = 'achievements'
+
+
+class AchievementRegistry:
+    """Loads the Achievement rows once per process and hands them out by level.
+
+    The Achievement post_save/post_delete signals bump a version stored in the
+    database. Each lookup compares it with the version that was loaded, so every
+    process reloads the rows after a change, not only the one that made it.
+    """
+
+    def __init__(self):
+        self._achievements = None
+        self._version = None
+
+    def get_achievements(self):
+        """Returns every registered achievement, lowest level first."""
+        version = CacheVersion.get_version(ACHIEVEMENTS_CACHE_VERSION)
+        if self._achievements is None or self._version != version:
+            self._achievements = self._load_achievements()
+            self._version = version
+        return self._achievements
+
+    def get_unlocked_achievements(self, level):
+        """Returns the achievements a profile at the given level should hold."""
+        return [achievement for achievement in self.get_achievements() if achievement.level <= level]
+
+    def refresh(self):
+        CacheVersion.bump(ACHIEVEMENTS_CACHE_VERSION)
+        self._achievements = None
+
+    def _load_achievements(self):
+        achievements_by_name = {
+            achievement.name: achievement
+            for achievement in Achievement.objects.filter(name__in=ACHIEVEMENT_LEVELS).order_by('-id')
+        }
+        missing_achievements = [
+            Achievement(name=name, level=level, description=f'Reached level {level} in journaling!')
+            for name, level in ACHIEVEMENT_LEVELS.items() if name not in achievements_by_name
+        ]
+        for achievement in Achievement.objects.bulk_create(missing_achievements):
+            achievements_by_name[achievement.name] = achievement
+
+        return sorted(achievements_by_name.values(), key=lambda achievement: achievement.level)
+
+
+achievement_registry = AchievementRegistry()
@@ -0,0 +1,220 @@
+"""ZIP archive of everything a user has written.
+
+The archive holds a JSON and a Markdown file for every entry, a JSON file for
+every journal and the entries' attachments. It is generated while it is being
+downloaded: entries are read with iterator() and each zip member is handed to
+the response as soon as it is written, so memory use does not grow with the
+size of the archive.
+
+The streamed bytes are also written to ARCHIVE_EXPORT_DIR. Once a download has
+finished, later requests for an unchanged archive are served from that file,
+which is what lets an interrupted download resume with a Range request. Saved
+archives not downloaded for ARCHIVE_EXPORT_MAX_AGE, and partial ones left by
+downloads that stopped more than ARCHIVE_EXPORT_STALE_AFTER ago, are deleted
+by delete_expired_archives().
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zipfile
+
+from django.conf import settings
+from django.utils.text import slugify
+
+from journals.models import Entry, Journal
+
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+# Attachments are mostly photos and videos, which do not get any smaller when deflated
+ATTACHMENT_COMPRESSION = zipfile.ZIP_STORED
+
+
+def get_archive_fingerprint(user):
+    """Returns a hash that changes whenever the content of the user's archive would."""
+    journals = user.get_associated_journals().order_by('id').values_list('id', 'name', 'content_version', 'template__questions')
+    content = json.dumps([user.pk, list(journals)], default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def get_archive_path(user, fingerprint):
+    return os.path.join(settings.ARCHIVE_EXPORT_DIR, f'user_{user.pk}_{fingerprint}.zip')
+
+
+def get_saved_archive_path(user, fingerprint):
+    """Returns the path of the user's archive if it has been downloaded in full since it last changed.
+
+    The archive is marked as used, so it is kept for another ARCHIVE_EXPORT_MAX_AGE.
+    """
+    archive_path = get_archive_path(user, fingerprint)
+    try:
+        os.utime(archive_path)
+    except FileNotFoundError:
+        return None
+    return archive_path
+
+
+def get_archive_filename(user):
+    return f'{slugify(user.username) or "journal"}_archive.zip'
+
+
+def stream_archive(user, fingerprint):
+    """Yields the user's archive while saving it, keeping the saved copy only if it was streamed to the end."""
+    os.makedirs(settings.ARCHIVE_EXPORT_DIR, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=settings.ARCHIVE_EXPORT_DIR, suffix='.tmp')
+    finished = False
+    try:
+        with os.fdopen(file_descriptor, 'wb') as saved_copy:
+            for chunk in iter_archive(user):
+                saved_copy.write(chunk)
+                yield chunk
+        archive_path = get_archive_path(user, fingerprint)
+        os.replace(temporary_path, archive_path)
+        finished = True
+        _delete_older_archives(user, keep=archive_path)
+        delete_expired_archives()
+    finally:
+        if not finished:
+            os.unlink(temporary_path)
+
+
+def delete_expired_archives(now=None):
+    """Deletes the saved archives not used for ARCHIVE_EXPORT_MAX_AGE and the abandoned partial ones.
+
+    Returns the number of files deleted.
+    """
+    now = now or time.time()
+    max_ages = {'.zip': settings.ARCHIVE_EXPORT_MAX_AGE, '.tmp': settings.ARCHIVE_EXPORT_STALE_AFTER}
+    deleted = 0
+    try:
+        directory = os.scandir(settings.ARCHIVE_EXPORT_DIR)
+    except FileNotFoundError:
+        return 0
+    with directory:
+        for dir_entry in directory:
+            max_age = max_ages.get(os.path.splitext(dir_entry.name)[1])
+            try:
+                if max_age is None or dir_entry.stat().st_mtime > now - max_age:
+                    continue
+                os.unlink(dir_entry.path)
+            except FileNotFoundError:
+                continue
+            deleted += 1
+    return deleted
+
+
+def iter_archive(user):
+    """Yields the bytes of the user's ZIP archive, one zip member at a time."""
+    output = _StreamOutput()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        journals = Journal.objects.filter(owner=user).select_related('template').order_by('id')
+        for journal in journals.iterator():
+            _write_json(archive, f'{_get_journal_directory(journal.id, journal.name)}/journal.json', {
+                'id': journal.id,
+                'name': journal.name,
+                'created': journal.date.isoformat(),
+                'questions': journal.template.questions if journal.template else [],
+            })
+            yield output.pop()
+
+        entries = (
+            Entry.objects.filter(journal__owner=user)
+            .select_related('journal__template')
+            .order_by('journal_id', 'date', 'id')
+        )
+        for entry in entries.iterator(chunk_size=500):
+            yield from _write_entry(archive, output, entry)
+    yield output.pop()
+
+
+def _write_entry(archive, output, entry):
+    questions = entry.journal.template.questions if entry.journal.template else []
+    entry_path = f'{_get_journal_directory(entry.journal_id, entry.journal.name)}/entries/{entry.date.isoformat()}_{entry.id}'
+    attachment_path = None
+    if entry.multimedia_file:
+        attachment_path = f'{entry_path}_{os.path.basename(entry.multimedia_file.name)}'
+
+    _write_json(archive, f'{entry_path}.json', {
+        'id': entry.id,
+        'name': entry.entry_name,
+        'date': entry.date.isoformat(),
+        'mood': entry.mood,
+        'responses': [
+            {'question': question, 'response': response}
+            for question, response in zip(questions, entry.responses)
+        ],
+        'attachment': os.path.basename(attachment_path) if attachment_path else None,
+    })
+    archive.writestr(_get_zip_info(f'{entry_path}.md', entry.date), _get_markdown(entry, questions, attachment_path))
+    yield output.pop()
+
+    if attachment_path:
+        try:
+            source = entry.multimedia_file.open('rb')
+        except FileNotFoundError:
+            return
+        with source, archive.open(_get_zip_info(attachment_path, entry.date, ATTACHMENT_COMPRESSION), 'w', force_zip64=True) as target:
+            for chunk in source.chunks(ATTACHMENT_CHUNK_SIZE):
+                target.write(chunk)
+                yield output.pop()
+
+
+def _get_markdown(entry, questions, attachment_path):
+    lines = [f'# {entry.entry_name}', '', f'*{entry.date.isoformat()}*', '']
+    if entry.mood:
+        lines += [f'Mood: {entry.mood}', '']
+    for question, response in zip(questions, entry.responses):
+        lines += [f'## {question}', '', str(response or ''), '']
+    if attachment_path:
+        lines += [f'[Attachment]({os.path.basename(attachment_path)})', '']
+    return '\n'.join(lines)
+
+
+def _write_json(archive, path, data):
+    archive.writestr(_get_zip_info(path), json.dumps(data, indent=2, ensure_ascii=False))
+
+
+def _get_zip_info(path, modified=None, compression=zipfile.ZIP_DEFLATED):
+    date_time = (modified.year, modified.month, modified.day, 0, 0, 0) if modified else (1980, 1, 1, 0, 0, 0)
+    zip_info = zipfile.ZipInfo(path, date_time=date_time)
+    zip_info.compress_type = compression
+    return zip_info
+
+
+def _get_journal_directory(journal_id, journal_name):
+    return f'journals/{journal_id}_{slugify(journal_name) or "journal"}'
+
+
+def _delete_older_archives(user, keep):
+    prefix = f'user_{user.pk}_'
+    with os.scandir(settings.ARCHIVE_EXPORT_DIR) as directory:
+        for dir_entry in directory:
+            if dir_entry.name.startswith(prefix) and dir_entry.name.endswith('.zip') and dir_entry.path != keep:
+                try:
+                    os.unlink(dir_entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+class _StreamOutput:
+    """Write-only file that collects what ZipFile writes until it is popped."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
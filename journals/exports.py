@@ -0,0 +1,95 @@
+"""Background PDF exports of whole journals.
+
+An export is keyed by a fingerprint of everything that ends up in the PDF, so
+asking again for a journal that has not changed reuses the last export instead
+of starting a new one. The PDF is rendered by the export_journal_pdf task into
+a temporary file and then copied into media storage in chunks.
+"""
+import hashlib
+import json
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from journals.models import Journal, JournalExport
+from journals.pdf import render_journal_pdf
+
+
+def get_journal_fingerprint(journal):
+    """Returns a hash that changes whenever the exported PDF of the journal would."""
+    questions = journal.template.questions if journal.template else []
+    content = json.dumps([journal.name, journal.content_version, questions])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def record_journal_change(journal_id):
+    """Marks the existing exports of the journal as out of date."""
+    Journal.objects.filter(pk=journal_id).update(content_version=F('content_version') + 1)
+
+
+def get_or_start_journal_export(journal, user):
+    """Returns the latest usable export of the journal as it is now, starting a new one if there is none.
+
+    Exports that have been pending or running for longer than JOURNAL_EXPORT_STALE_AFTER
+    are assumed to belong to a lost worker and are not reused.
+    """
+    fingerprint = get_journal_fingerprint(journal)
+    stale_before = timezone.now() - timedelta(seconds=settings.JOURNAL_EXPORT_STALE_AFTER)
+    exports = JournalExport.objects.filter(journal=journal, fingerprint=fingerprint).order_by('-id')
+    for export in exports[:5]:
+        if export.status == JournalExport.DONE and export.file and export.file.storage.exists(export.file.name):
+            return export
+        if export.status in (JournalExport.PENDING, JournalExport.RUNNING) and export.updated_at >= stale_before:
+            return export
+
+    export = JournalExport.objects.create(journal=journal, requested_by=user, fingerprint=fingerprint)
+    from journals.tasks import export_journal_pdf
+    transaction.on_commit(lambda: export_journal_pdf.delay(export.id))
+    return export
+
+
+def run_journal_export(export_id):
+    """Renders the export's PDF, recording progress as the entries are laid out."""
+    export = JournalExport.objects.select_related('journal__template').get(pk=export_id)
+    if export.is_finished():
+        return export
+    _update_export(export, status=JournalExport.RUNNING, progress=0)
+
+    def record_progress(laid_out, total):
+        progress = laid_out * 100 // total if total else 100
+        if progress != export.progress:
+            _update_export(export, progress=progress)
+
+    try:
+        with tempfile.TemporaryFile(suffix='.pdf') as output:
+            render_journal_pdf(export.journal, output, on_progress=record_progress)
+            output.seek(0)
+            export.file.save(f'journal_{export.journal_id}_{export.fingerprint[:12]}.pdf', File(output), save=False)
+    except Exception:
+        _update_export(export, status=JournalExport.FAILED)
+        raise
+
+    _update_export(export, status=JournalExport.DONE, progress=100, file=export.file.name)
+    _delete_older_exports(export)
+    return export
+
+
+def _update_export(export, **fields):
+    fields['updated_at'] = timezone.now()
+    JournalExport.objects.filter(pk=export.pk).update(**fields)
+    for name, value in fields.items():
+        if name != 'file':
+            setattr(export, name, value)
+
+
+def _delete_older_exports(export):
+    older_exports = JournalExport.objects.filter(journal_id=export.journal_id, id__lt=export.id)
+    for older_export in older_exports.exclude(status__in=[JournalExport.PENDING, JournalExport.RUNNING]):
+        if older_export.file:
+            older_export.file.delete(save=False)
+        older_export.delete()
@@ -4,9 +4,12 @@ from django.db import models
 from django.contrib.auth import authenticate
 from django.core.validators import RegexValidator, FileExtensionValidator
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 from journals.helpers import get_users_accessible_templates
-from .models import User, Journal, Template, Entry, Profile
+from journals.search import NO_MOOD
+from .models import User, Journal, Template, Entry, Profile, mood_choices
 import os
+from zoneinfo import available_timezones
 
 
 class LogInForm(forms.Form):
@@ -29,11 +32,30 @@ class LogInForm(forms.Form):
 class UserForm(forms.ModelForm):
     """Form to update user profiles."""
 
+    time_zone = forms.ChoiceField(
+        label='Time zone',
+        choices=[(name, name) for name in sorted(available_timezones())],
+        required=False,
+    )
+
     class Meta:
         """Form options."""
 
         model = User
-        fields = ['first_name', 'last_name', 'username', 'email']
+        fields = ['first_name', 'last_name', 'username', 'email', 'time_zone', 'reminder_hour']
+        labels = {'reminder_hour': 'Daily reminder at'}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The reminder settings keep their current values when they are left out
+        self.fields['reminder_hour'].required = False
+
+    def clean_time_zone(self):
+        return self.cleaned_data['time_zone'] or self.instance.time_zone
+
+    def clean_reminder_hour(self):
+        reminder_hour = self.cleaned_data['reminder_hour']
+        return self.instance.reminder_hour if reminder_hour in (None, '') else reminder_hour
 
 class NewPasswordMixin(forms.Form):
     """Form mixing for new_password and password_confirmation fields."""
@@ -317,6 +339,41 @@ class SearchForm(forms.Form):
             search_filter[self.model_foreign_key] = self.model_foreign_key_value
             
         return search_filter
-                
-        
-    
\ No newline at end of file
+
+
+class EntrySearchForm(forms.Form):
+    """Form for searching the entries of every journal a user owns."""
+
+    q = forms.CharField(label="Search", max_length=100, required=False)
+    journal = forms.ModelChoiceField(queryset=Journal.objects.none(), required=False, empty_label="All journals")
+    mood = forms.ChoiceField(choices=[('', 'Any mood')] + mood_choices + [(NO_MOOD, 'No mood')], required=False)
+    start_date = forms.DateField(label="From", required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(label="To", required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def __init__(self, user, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['journal'].queryset = user.get_associated_journals()
+
+    def clean(self):
+        """Check the date range is not reversed."""
+
+        super().clean()
+        start_date = self.cleaned_data.get('start_date')
+        end_date = self.cleaned_data.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            self.add_error('end_date', 'End date must not be before the start date.')
+
+    def filter_entries(self, entries):
+        """Applies the journal, mood and date filters to the entries."""
+
+        if self.cleaned_data.get('journal'):
+            entries = entries.filter(journal=self.cleaned_data['journal'])
+        if self.cleaned_data.get('mood') == NO_MOOD:
+            entries = entries.filter(Q(mood__isnull=True) | Q(mood=''))
+        elif self.cleaned_data.get('mood'):
+            entries = entries.filter(mood=self.cleaned_data['mood'])
+        if self.cleaned_data.get('start_date'):
+            entries = entries.filter(date__gte=self.cleaned_data['start_date'])
+        if self.cleaned_data.get('end_date'):
+            entries = entries.filter(date__lte=self.cleaned_data['end_date'])
+        return entries
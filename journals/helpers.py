@@ -1,5 +1,12 @@
+import os
+import re
+from datetime import date
 from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers, quote_etag, set_response_etag
+from django.utils.http import content_disposition_header
 
 from journals.models import Template, User
 
@@ -27,3 +34,104 @@ def redirect_to_custom_template_view(request, journal_name):
 
 def get_users_accessible_templates(user):
     return Template.objects.filter(owner=user) | Template.objects.filter(owner=User.objects.get(username=settings.DEFAULT_TEMPLATES_OWNER_USERNAME))
+
+def get_cacheable_fragment_response(request, response):
+    """Lets the browser cache a per-user page fragment and revalidate it with its ETag."""
+    patch_cache_control(response, private=True, max_age=settings.FRAGMENT_CACHE_MAX_AGE)
+    patch_vary_headers(response, ['Cookie'])
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+def get_versioned_fragment_response(request, etag, render_fragment):
+    """Lets the browser cache a per-user page fragment and revalidate it with an ETag known before rendering.
+
+    The ETag is built from cheap inputs such as a version number, so a browser whose copy
+    is still current gets a 304 without the fragment's queries being run or its template rendered.
+    """
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render_fragment()
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=settings.FRAGMENT_CACHE_MAX_AGE)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+def get_entries_page(entries, cursor=None, page_size=None):
+    """Returns a page of entries, newest first, and the cursor of the following page.
+
+    Pages are selected by seeking past the (date, id) of the previous page's last entry
+    rather than with an OFFSET, so every page costs the same however deep it is.
+    """
+    page_size = page_size or settings.ENTRIES_PAGE_SIZE
+    entries = entries.order_by('-date', '-id')
+    position = _parse_entries_cursor(cursor)
+    if position is not None:
+        entry_date, entry_id = position
+        entries = entries.filter(Q(date__lt=entry_date) | Q(date=entry_date, id__lt=entry_id))
+
+    page = list(entries[:page_size + 1])
+    if len(page) <= page_size:
+        return page, None
+    page = page[:page_size]
+    return page, f'{page[-1].date.isoformat()}_{page[-1].id}'
+
+def _parse_entries_cursor(cursor):
+    try:
+        entry_date, entry_id = cursor.split('_')
+        return date.fromisoformat(entry_date), int(entry_id)
+    except (AttributeError, ValueError):
+        return None
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+FILE_CHUNK_SIZE = 64 * 1024
+
+def get_ranged_file_response(request, path, filename, content_type, etag):
+    """Streams the file as a download, or the single byte range the request asks for.
+
+    A Range header is only honoured when an If-Range header sent along with it still
+    matches the ETag, so a resumed download never mixes two versions of the file.
+    """
+    size = os.path.getsize(path)
+    status, start, end = 200, 0, size - 1
+    requested_range = request.headers.get('Range')
+    if requested_range and request.headers.get('If-Range', etag) == etag:
+        byte_range = _parse_byte_range(requested_range, size)
+        if byte_range is None:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        status, (start, end) = 206, byte_range
+
+    response = StreamingHttpResponse(_read_file_range(path, start, end - start + 1), status=status, content_type=content_type)
+    if status == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def _parse_byte_range(requested_range, size):
+    match = RANGE_PATTERN.match(requested_range.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1  # The last bytes of the file
+    if start > end or (not first and not int(last)):
+        return None
+    return start, end
+
+def _read_file_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(FILE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
@@ -0,0 +1,64 @@
+"""Scaled down copies of image attachments for embedding in PDFs.
+
+reportlab embeds images at their full resolution, so a phone photo drawn in a
+300 point box still costs a full decode and several megabytes of PDF. The first
+time an attachment is exported, a copy that fits PDF_IMAGE_MAX_SIZE is saved
+next to the other media files and every later export embeds that copy. The
+copy is named after the attachment's full storage name, extension included,
+and the Entry signals delete it when the attachment is replaced or removed.
+"""
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+PDF_IMAGE_DIRECTORY = 'derivatives/pdf'
+PDF_IMAGE_MAX_SIZE = (600, 600)  # Twice the 300 point box the PDF draws images in
+PDF_IMAGE_QUALITY = 80
+
+
+def get_pdf_image_path(field_file):
+    """Returns the local path of the attachment's PDF sized copy, or None if it is not an image."""
+    storage = field_file.storage
+    name = get_pdf_image_name(field_file.name)
+    if not storage.exists(name):
+        with field_file.open('rb') as source:
+            output = BytesIO()
+            if not make_pdf_image(source, output):
+                return None
+        name = storage.save(name, ContentFile(output.getvalue()))
+    return storage.path(name)
+
+
+def get_pdf_image_name(name):
+    return f'{PDF_IMAGE_DIRECTORY}/{name}.jpg'
+
+
+def delete_pdf_image(storage, name):
+    """Deletes the PDF sized copy of the attachment with the storage name, if there is one."""
+    storage.delete(get_pdf_image_name(name))
+
+
+def make_pdf_image(source, output):
+    """Writes a JPEG of the source image that fits PDF_IMAGE_MAX_SIZE to the output.
+
+    Returns False, writing nothing, if the source is not an image Pillow can read.
+    """
+    try:
+        image = Image.open(source)
+        # Lets JPEGs decode straight to a reduced size instead of at full resolution
+        image.draft('RGB', PDF_IMAGE_MAX_SIZE)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(PDF_IMAGE_MAX_SIZE)
+    except (UnidentifiedImageError, OSError):
+        return False
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.save(output, 'JPEG', quality=PDF_IMAGE_QUALITY, optimize=True)
+    return True
@@ -0,0 +1,62 @@
+"""Leaderboard ranking backed by the (level, experience) index on Profile."""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from journals.models import CacheVersion, Profile
+
+TOP_PROFILES_CACHE_KEY = 'leaderboard:top_profiles'
+
+
+def get_top_profiles_cache_key():
+    """Return the cache key of the current top list.
+
+    The key carries the version stored in the database, so an invalidation made by
+    any process is seen by all of them, even with a separate cache per process.
+    """
+
+    return f'{TOP_PROFILES_CACHE_KEY}:{CacheVersion.get_version(TOP_PROFILES_CACHE_KEY)}'
+
+
+def get_top_profiles():
+    """Return the cached list of the highest ranked profiles."""
+
+    cache_key = get_top_profiles_cache_key()
+    top_profiles = cache.get(cache_key)
+    if top_profiles is None:
+        top_profiles = list(
+            Profile.objects.select_related('user', 'top_achievement').order_by(*Profile.LEADERBOARD_ORDERING)[:settings.LEADERBOARD_SIZE]
+        )
+        cache.set(cache_key, top_profiles, settings.LEADERBOARD_CACHE_TIMEOUT)
+    return top_profiles
+
+
+def get_rank(profile):
+    """Return the 1-based rank of a profile by counting the profiles ahead of it."""
+
+    profiles_ahead = Profile.objects.filter(
+        Q(level__gt=profile.level) |
+        Q(level=profile.level, experience__gt=profile.experience) |
+        Q(level=profile.level, experience=profile.experience, id__lt=profile.id)
+    )
+    return profiles_ahead.count() + 1
+
+
+def invalidate_top_profiles():
+    CacheVersion.bump(TOP_PROFILES_CACHE_KEY)
+
+
+def invalidate_top_profiles_if_affected(profile):
+    """Drop the cached top list only if the profile's score can change its contents."""
+
+    top_profiles = cache.get(get_top_profiles_cache_key())
+    if top_profiles is None:
+        return
+
+    if len(top_profiles) < settings.LEADERBOARD_SIZE or any(top.id == profile.id for top in top_profiles):
+        invalidate_top_profiles()
+        return
+
+    lowest = top_profiles[-1]
+    if (profile.level, profile.experience) >= (lowest.level, lowest.experience):
+        invalidate_top_profiles()
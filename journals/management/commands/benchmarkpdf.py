@@ -0,0 +1,50 @@
+import io
+import random
+from datetime import date, timedelta
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from journals.models import Entry, mood_choices
+from journals.pdf import create_doc_template, get_journal_elements
+
+
+class Command(BaseCommand):
+    """Build automation command to measure how fast journal PDFs are rendered."""
+
+    JOURNAL_SIZES = [10, 100, 1000]
+    QUESTIONS = ['How are you feeling today?', 'What went well?', 'What could have gone better?', 'What are you grateful for?']
+    help = 'Reports pages per second when rendering journals of 10, 100 and 1,000 entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=self.JOURNAL_SIZES)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        randomiser = random.Random(options['seed'])
+        for size in options['sizes']:
+            entries = [self._create_entry(randomiser, i) for i in range(size)]
+            timings = []
+            for _ in range(options['repeat']):
+                start = perf_counter()
+                doc = create_doc_template(io.BytesIO())
+                doc.build(get_journal_elements('Benchmark journal', entries, self.QUESTIONS))
+                timings.append(perf_counter() - start)
+            best = min(timings)
+            self.stdout.write(
+                f'{size} entries: {doc.page} pages in {best:.2f} s, {doc.page / best:.1f} pages/s, {size / best:.1f} entries/s'
+            )
+
+    def _create_entry(self, randomiser, index):
+        words = ['journal', 'today', 'walked', 'coffee', 'friends', 'work', 'sleep', 'rain', 'reading', 'music']
+        responses = [
+            ' '.join(randomiser.choice(words) for _ in range(randomiser.choice([5, 40, 200, 2000])))
+            for _ in self.QUESTIONS
+        ]
+        return Entry(
+            entry_name=f'Entry {index}',
+            date=date(2024, 1, 1) + timedelta(days=index),
+            mood=randomiser.choice(mood_choices)[0],
+            responses=responses,
+        )
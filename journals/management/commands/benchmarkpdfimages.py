@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from PIL import Image as PILImage
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import Image, SimpleDocTemplate, Spacer
+
+from journals.images import make_pdf_image
+
+
+class Command(BaseCommand):
+    """Build automation command to compare PDF exports of full size and downscaled photos."""
+
+    help = 'Times a PDF of photo attachments embedded at full size against one using downscaled copies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=20)
+        parser.add_argument('--width', type=int, default=4000)
+        parser.add_argument('--height', type=int, default=3000)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            originals = [self._create_photo(directory, i, options['width'], options['height']) for i in range(options['images'])]
+
+            start = perf_counter()
+            derivatives = []
+            for original in originals:
+                derivative = f'{original}.pdf.jpg'
+                with open(original, 'rb') as source, open(derivative, 'wb') as output:
+                    make_pdf_image(source, output)
+                derivatives.append(derivative)
+            derivative_time = perf_counter() - start
+
+            self._report('full size', *self._build_pdf(directory, 'full_size.pdf', originals))
+            build_time, size = self._build_pdf(directory, 'downscaled.pdf', derivatives)
+            self._report('downscaled', build_time, size)
+            self.stdout.write(f'creating {len(derivatives)} downscaled copies took {derivative_time:.2f} s, once per attachment')
+        finally:
+            shutil.rmtree(directory)
+
+    def _create_photo(self, directory, index, width, height):
+        path = os.path.join(directory, f'photo_{index}.jpg')
+        # Noise compresses about as badly as a real photo
+        PILImage.effect_noise((width, height), 64 + index).convert('RGB').save(path, 'JPEG', quality=90)
+        return path
+
+    def _build_pdf(self, directory, filename, image_paths):
+        path = os.path.join(directory, filename)
+        elements = []
+        for image_path in image_paths:
+            elements += [Image(image_path, width=300, height=300), Spacer(1, 20)]
+        start = perf_counter()
+        SimpleDocTemplate(path, pagesize=letter).build(elements)
+        return perf_counter() - start, os.path.getsize(path)
+
+    def _report(self, label, build_time, size):
+        self.stdout.write(f'{label}: built in {build_time:.2f} s, {size / 1024 / 1024:.1f} MB')
@@ -0,0 +1,48 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from journals.models import Entry, User
+from journals.suggestions import get_suggestions, invalidate_suggestions
+
+
+class Command(BaseCommand):
+    """Build automation command to measure the latency of typeahead suggestions."""
+
+    LOOKUP_COUNT = 2000
+    help = 'Times typeahead suggestion lookups against the users and entries in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=self.LOOKUP_COUNT)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        randomiser = random.Random(options['seed'])
+        entries = list(Entry.objects.values_list('journal__owner_id', 'journal_id', 'entry_name')[:10000])
+        if not entries:
+            raise CommandError('There are no users with entries to look up; seed some entries first')
+
+        cold_timings, warm_timings = [], []
+        for _ in range(options['lookups']):
+            user_id, journal_id, name = randomiser.choice(entries)
+            user = User(id=user_id)
+            prefix = name[:randomiser.randint(1, max(1, min(len(name), 6)))]
+
+            invalidate_suggestions(user.id)
+            cold_timings.append(self._time_lookup(user, prefix, journal_id))
+            warm_timings.append(self._time_lookup(user, prefix, journal_id))
+
+        self._report('cold cache', cold_timings)
+        self._report('warm cache', warm_timings)
+
+    def _time_lookup(self, user, prefix, journal_id):
+        start = perf_counter()
+        get_suggestions(user, prefix, journal_id=journal_id)
+        return (perf_counter() - start) * 1000
+
+    def _report(self, label, timings):
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(f'{label}: {len(timings)} lookups, p50 {p50:.2f} ms, p99 {p99:.2f} ms, max {timings[-1]:.2f} ms')
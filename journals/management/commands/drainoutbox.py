@@ -0,0 +1,113 @@
+import random
+import socketserver
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from journals.outbox import TokenBucket, drain_outbox, get_outbox_depth
+
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """Accepts mail like an SMTP server and counts it, without delivering anything."""
+
+    def handle(self):
+        self.reply('220 localhost stand-in SMTP server')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+            if command.startswith('EHLO') or command.startswith('HELO'):
+                self.reply('250 localhost')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.record_message(self)
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+    def reply(self, text):
+        self.wfile.write(f'{text}\r\n'.encode('ascii'))
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, fail_rate=0, seed=0):
+        super().__init__(address, StandInSMTPHandler)
+        self.fail_rate = fail_rate
+        self.randomiser = random.Random(seed)
+        self.received = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def record_message(self, handler):
+        with self.lock:
+            rejected = self.randomiser.random() < self.fail_rate
+            if rejected:
+                self.rejected += 1
+            else:
+                self.received += 1
+        handler.reply('451 Temporary failure, try again later' if rejected else '250 Message accepted')
+
+
+class Command(BaseCommand):
+    """Build automation command to drain the email outbox locally."""
+
+    help = 'Sends the due emails in the outbox to a stand-in SMTP server and reports the queue depth'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-messages', type=int, default=None)
+        parser.add_argument('--rate', type=float, default=None, help='Emails per second, OUTBOX_RATE_PER_SECOND by default')
+        parser.add_argument('--smtp-host', default=None, help='Send to this server instead of starting a stand-in one')
+        parser.add_argument('--smtp-port', type=int, default=1025)
+        parser.add_argument('--fail-rate', type=float, default=0, help='Share of emails the stand-in server rejects')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Queue depth before: {get_outbox_depth()}')
+        server = None
+        if options['smtp_host']:
+            host, port = options['smtp_host'], options['smtp_port']
+        else:
+            server = StandInSMTPServer(('127.0.0.1', 0), fail_rate=options['fail_rate'])
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            host, port = server.server_address
+
+        rate = options['rate'] or settings.OUTBOX_RATE_PER_SECOND
+        connection_options = {
+            'backend': 'django.core.mail.backends.smtp.EmailBackend',
+            'host': host,
+            'port': port,
+            'username': '',
+            'password': '',
+            'use_tls': False,
+            'use_ssl': False,
+        }
+        try:
+            report = drain_outbox(
+                max_messages=options['max_messages'],
+                connection_options=connection_options,
+                bucket=TokenBucket(rate, max(rate, settings.OUTBOX_BURST)),
+            )
+        finally:
+            if server:
+                server.shutdown()
+                server.server_close()
+
+        if report['skipped']:
+            self.stdout.write(self.style.WARNING('Another drain of the outbox is running, so nothing was sent'))
+        if server:
+            self.stdout.write(f'Stand-in server on {host}:{port} accepted {server.received} and rejected {server.rejected}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {report['sent']}, retried {report['retried']}, failed {report['failed']}, released {report['released']} "
+            f"in {report['seconds']}s ({report['per_second']} per second)"
+        ))
+        self.stdout.write(f"Queue depth after: {report['depth']}")
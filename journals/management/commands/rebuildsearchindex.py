@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from journals.models import Entry
+from journals.search import get_entry_search_backend
+
+
+class Command(BaseCommand):
+    """Build automation command to rebuild the entry full-text search index."""
+
+    BATCH_SIZE = 500
+    help = 'Rebuilds the full-text search index over entry names and responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=self.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        backend = get_entry_search_backend()
+        if backend is None:
+            raise CommandError('Full-text search is not supported on this database')
+
+        batch_size = options['batch_size']
+        backend.create_index()
+        backend.clear_index()
+        entry_count = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Entry.objects.filter(id__gt=last_id).order_by('id').only('id', 'entry_name', 'responses')[:batch_size]
+            )
+            if not batch:
+                break
+            with transaction.atomic():
+                backend.index_entries(batch)
+            entry_count += len(batch)
+            last_id = batch[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {entry_count} entries'))
@@ -0,0 +1,46 @@
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+
+from journals.models import STREAK_FIELDS, Entry, Journal, calculate_streaks
+
+
+class Command(BaseCommand):
+    """Build automation command to rebuild the stored journal streaks."""
+
+    BATCH_SIZE = 500
+    help = 'Rebuilds current_streak, longest_streak and last_entry_date for every journal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=self.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        journals = []
+        journal_count = 0
+
+        for journal_id, rows in groupby(self._get_entry_dates(), key=lambda row: row[0]):
+            journal = Journal(id=journal_id)
+            journal.current_streak, journal.longest_streak, journal.last_entry_date = calculate_streaks(
+                entry_date for _, entry_date in rows
+            )
+            journals.append(journal)
+            if len(journals) >= batch_size:
+                journal_count += self._save_streaks(journals)
+                journals = []
+        journal_count += self._save_streaks(journals)
+
+        Journal.objects.filter(entries__isnull=True).update(current_streak=0, longest_streak=0, last_entry_date=None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt streaks for {journal_count} journals'))
+
+    def _get_entry_dates(self):
+        return (
+            Entry.objects.order_by('journal_id', 'date')
+            .values_list('journal_id', 'date')
+            .distinct()
+            .iterator(chunk_size=self.BATCH_SIZE * 10)
+        )
+
+    def _save_streaks(self, journals):
+        Journal.objects.bulk_update(journals, STREAK_FIELDS)
+        return len(journals)
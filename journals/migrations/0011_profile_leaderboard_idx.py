@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-17 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journals', '0010_response'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['level', 'experience'], name='profile_leaderboard_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.6 on 2026-10-17 18:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_top_achievement(apps, schema_editor):
+    Profile = apps.get_model('journals', 'Profile')
+    for profile in Profile.objects.filter(achievements__isnull=False).distinct():
+        profile.top_achievement = profile.achievements.order_by('-level').first()
+        profile.save(update_fields=['top_achievement'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journals', '0011_profile_leaderboard_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='top_achievement',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='journals.achievement'),
+        ),
+        migrations.RunPython(populate_top_achievement, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.6 on 2026-10-17 18:06
+
+from django.db import migrations
+
+
+ACHIEVEMENT_LEVELS = {
+    'Getting Started': 2,
+    'Novice Scribe': 5,
+    'Journal Enthusiast': 10,
+    'Diary Keeper': 15,
+    'Journal Master': 20,
+    'Memoir Architect': 25,
+    'Sage of Stories': 30,
+    'Chronicle Champion': 40,
+    'Legend of Literature': 50,
+    'Pinnacle of Penmanship': 60,
+    'Archivist Ascendant': 75,
+    'Epic of Expression': 100,
+}
+
+
+def create_achievements(apps, schema_editor):
+    Achievement = apps.get_model('journals', 'Achievement')
+    existing_names = set(Achievement.objects.values_list('name', flat=True))
+    Achievement.objects.bulk_create([
+        Achievement(name=name, level=level, description=f'Reached level {level} in journaling!')
+        for name, level in ACHIEVEMENT_LEVELS.items() if name not in existing_names
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journals', '0012_profile_top_achievement'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_achievements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.6 on 2026-10-17 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journals', '0013_populate_achievements'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journal',
+            name='current_streak',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='journal',
+            name='last_entry_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='journal',
+            name='longest_streak',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
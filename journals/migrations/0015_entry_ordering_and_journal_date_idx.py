@@ -0,0 +1,21 @@
+# Generated by Django 4.2.6 on 2026-10-17 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journals', '0014_journal_streak_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='entry',
+            options={'ordering': ['-date', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['journal', '-date', '-id'], name='entry_journal_date_idx'),
+        ),
+    ]
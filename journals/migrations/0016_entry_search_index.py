@@ -0,0 +1,91 @@
+from django.db import migrations
+
+# The DDL and the initial indexing are copied from journals.search as it was when this
+# migration was written, so later changes to that module do not change what it does.
+SEARCH_TABLE = 'journals_entry_search'
+SEARCH_CONFIG = 'english'
+BATCH_SIZE = 1000
+
+
+def get_responses_text(responses):
+    if isinstance(responses, dict):
+        responses = responses.values()
+    return ' '.join(str(response) for response in responses or [] if response)
+
+
+def create_sqlite_index(cursor):
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+        f"USING fts5(entry_name, responses, tokenize='porter unicode61')"
+    )
+
+
+def index_sqlite_entries(cursor, entries):
+    cursor.executemany(
+        f'INSERT INTO {SEARCH_TABLE} (rowid, entry_name, responses) VALUES (%s, %s, %s)',
+        [(entry.id, entry.entry_name, get_responses_text(entry.responses)) for entry in entries]
+    )
+
+
+def create_postgresql_index(cursor):
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+        f"entry_id bigint PRIMARY KEY REFERENCES journals_entry (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+        f"content text NOT NULL, "
+        f"document tsvector NOT NULL)"
+    )
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_idx ON {SEARCH_TABLE} USING GIN (document)')
+
+
+def index_postgresql_entries(cursor, entries):
+    rows = []
+    for entry in entries:
+        responses_text = get_responses_text(entry.responses)
+        rows.append((entry.id, f'{entry.entry_name} {responses_text}', entry.entry_name, responses_text))
+    cursor.executemany(
+        f"INSERT INTO {SEARCH_TABLE} (entry_id, content, document) VALUES (%s, %s, "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', %s), 'A') || setweight(to_tsvector('{SEARCH_CONFIG}', %s), 'B')) "
+        f"ON CONFLICT (entry_id) DO UPDATE SET content = EXCLUDED.content, document = EXCLUDED.document",
+        rows
+    )
+
+
+SEARCH_INDEXES = {
+    'sqlite': (create_sqlite_index, index_sqlite_entries),
+    'postgresql': (create_postgresql_index, index_postgresql_entries),
+}
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor not in SEARCH_INDEXES:
+        return
+    create_index, index_entries = SEARCH_INDEXES[schema_editor.connection.vendor]
+    Entry = apps.get_model('journals', 'Entry')
+    entries = Entry.objects.only('id', 'entry_name', 'responses').order_by('id')
+    with schema_editor.connection.cursor() as cursor:
+        create_index(cursor)
+        batch = []
+        for entry in entries.iterator(chunk_size=BATCH_SIZE):
+            batch.append(entry)
+            if len(batch) >= BATCH_SIZE:
+                index_entries(cursor, batch)
+                batch = []
+        if batch:
+            index_entries(cursor, batch)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in SEARCH_INDEXES:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journals', '0015_entry_ordering_and_journal_date_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.6 on 2026-10-17 18:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import journals.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journals', '0016_entry_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journal',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='JournalExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('file', models.FileField(blank=True, null=True, upload_to=journals.models.journal_export_upload_path)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('journal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exports', to='journals.journal')),
+                ('requested_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['journal', 'fingerprint'], name='journal_export_lookup_idx')],
+            },
+        ),
+    ]
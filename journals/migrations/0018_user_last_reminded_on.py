@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-17 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journals', '0017_journal_exports'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='last_reminded_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
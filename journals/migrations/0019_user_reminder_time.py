@@ -0,0 +1,32 @@
+# Generated by Django 4.2.6 on 2026-10-17 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journals', '0018_user_last_reminded_on'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='reminder_hour',
+            field=models.PositiveSmallIntegerField(choices=[(0, '00:00'), (1, '01:00'), (2, '02:00'), (3, '03:00'), (4, '04:00'), (5, '05:00'), (6, '06:00'), (7, '07:00'), (8, '08:00'), (9, '09:00'), (10, '10:00'), (11, '11:00'), (12, '12:00'), (13, '13:00'), (14, '14:00'), (15, '15:00'), (16, '16:00'), (17, '17:00'), (18, '18:00'), (19, '19:00'), (20, '20:00'), (21, '21:00'), (22, '22:00'), (23, '23:00')], default=20),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='reminder_utc_hour',
+            field=models.PositiveSmallIntegerField(default=20),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='time_zone',
+            field=models.CharField(default='UTC', max_length=63),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['reminder_utc_hour', 'id'], name='user_reminder_utc_hour_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.6 on 2026-10-17 19:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journals', '0020_outbound_emails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxDrainLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('holder', models.CharField(blank=True, max_length=32)),
+                ('held_until', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
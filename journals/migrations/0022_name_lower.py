@@ -0,0 +1,49 @@
+# Generated by Django 4.2.6 on 2026-10-17 19:32
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_lowercase_names(apps, schema_editor):
+    # Lowercased in Python, as the models do, since SQLite's LOWER() only handles ASCII
+    for model_name, field_name in (('Journal', 'name'), ('Entry', 'entry_name')):
+        model = apps.get_model('journals', model_name)
+        batch = []
+        for instance in model.objects.only('id', field_name).order_by('id').iterator(chunk_size=BATCH_SIZE):
+            setattr(instance, f'{field_name}_lower', getattr(instance, field_name).lower())
+            batch.append(instance)
+            if len(batch) >= BATCH_SIZE:
+                model.objects.bulk_update(batch, [f'{field_name}_lower'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, [f'{field_name}_lower'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journals', '0021_outbox_drain_lock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='entry_name_lower',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='journal',
+            name='name_lower',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_lowercase_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['journal', 'entry_name_lower'], name='entry_journal_name_idx', opclasses=['', 'varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='journal',
+            index=models.Index(fields=['owner', 'name_lower'], name='journal_owner_name_idx', opclasses=['', 'varchar_pattern_ops']),
+        ),
+    ]
@@ -1,11 +1,15 @@
 from django.core.validators import RegexValidator
 from django.contrib.auth.models import AbstractUser
-from django.db import models
-from datetime import date, timedelta
+from django.db import models, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Subquery, Value, Window
+from django.db.models.functions import Cast, Coalesce, DenseRank, Floor, Sqrt
+from datetime import date, datetime, time, timedelta
 from django.db.models.signals import post_save
+from math import isqrt
 import uuid
 from django.utils import timezone
 from datetime import timedelta, date
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 # Dictionary of attainable achievements and levels
 
@@ -31,6 +35,27 @@ mood_choices = [
         ('angry', 'Angry'),
    ]
 
+# Journal fields holding the denormalized entry streak
+STREAK_FIELDS = ['current_streak', 'longest_streak', 'last_entry_date']
+
+# Local hours at which a user can choose to receive the daily reminder email
+REMINDER_HOUR_CHOICES = [(hour, f'{hour:02d}:00') for hour in range(24)]
+DEFAULT_REMINDER_HOUR = 20
+
+def get_time_zone(time_zone):
+    """Returns the ZoneInfo of the time zone name, or UTC if there is no such time zone."""
+    try:
+        return ZoneInfo(time_zone)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+def get_reminder_utc_hour(time_zone, reminder_hour, day=None):
+    """Returns the UTC hour in which the local reminder hour of the time zone falls on the day, today by default."""
+    zone = get_time_zone(time_zone)
+    day = day or timezone.now().astimezone(zone).date()
+    local_reminder_time = datetime.combine(day, time(reminder_hour), tzinfo=zone)
+    return local_reminder_time.astimezone(ZoneInfo('UTC')).hour
+
 class User(AbstractUser):
     """Model used for user authentication, and team member related information."""
 
@@ -46,17 +71,46 @@ class User(AbstractUser):
     last_name = models.CharField(max_length=50, blank=False)
     email = models.EmailField(unique=True, blank=False)
     recently_accessed_journals = models.JSONField(default=list, blank=True, null=True)  
+    last_reminded_on = models.DateField(null=True, blank=True)  # Day of the last reminder email, so one is sent at most once a day
+    time_zone = models.CharField(max_length=63, default='UTC')
+    reminder_hour = models.PositiveSmallIntegerField(default=DEFAULT_REMINDER_HOUR, choices=REMINDER_HOUR_CHOICES)
+    reminder_utc_hour = models.PositiveSmallIntegerField(default=DEFAULT_REMINDER_HOUR)  # reminder_hour in UTC, kept by save()
     
     
 
     class Meta:
         """Model options."""
         ordering = ['last_name', 'first_name']
+        indexes = [
+            # The hourly reminder job selects one UTC hour's users in id ranges
+            models.Index(fields=['reminder_utc_hour', 'id'], name='user_reminder_utc_hour_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.reminder_utc_hour = get_reminder_utc_hour(self.time_zone, self.reminder_hour)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'time_zone', 'reminder_hour'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'reminder_utc_hour'}
+        super().save(*args, **kwargs)
 
     def get_journals_without_today_entry(self):
-        journals = self.get_associated_journals()
-        journals_without_today_entry = [journal.id for journal in journals if not journal.check_if_today_entry_exists()]
-        return journals.filter(id__in= journals_without_today_entry)
+        """Returns the user's journals that have no entry dated today."""
+        return self.get_associated_journals().filter(~Exists(self._get_today_entries_of_outer_journal()))
+
+    def get_journals_grouped_by_today_entry(self):
+        """Returns (journals with an entry today, journals without one) from a single query."""
+        journals_with_today_entry = []
+        journals_without_today_entry = []
+        journals = self.get_associated_journals().annotate(has_today_entry=Exists(self._get_today_entries_of_outer_journal()))
+        for journal in journals:
+            if journal.has_today_entry:
+                journals_with_today_entry.append(journal)
+            else:
+                journals_without_today_entry.append(journal)
+        return journals_with_today_entry, journals_without_today_entry
+
+    def _get_today_entries_of_outer_journal(self):
+        return Entry.objects.filter(journal=OuterRef('pk'), date=date.today())
     
     def get_user_today_entries(self):
         journals = self.get_associated_journals()
@@ -65,18 +119,24 @@ class User(AbstractUser):
         
     
     def add_to_journals_recently_accessed(self, journal):
-        """This treats the JSONField as a set of size 3"""
-        journal_id = journal.id
-        if journal_id in self.recently_accessed_journals:
-            self.recently_accessed_journals.remove(journal_id)
-        if len(self.recently_accessed_journals) == 4:
-            self.recently_accessed_journals.pop(3)
-        
-        self.recently_accessed_journals = [journal.id] + self.recently_accessed_journals
-        self.save()  # Don't forget to save the model to persist changes
+        """Moves the journal to the front of the recently accessed journals, which holds up to four."""
+        from journals import recently_accessed
+
+        recently_accessed.add_journal_id(self, journal.id)
         
     def get_recently_accessed_journals(self):
-        return [Journal.objects.get(id=journal_id,) for journal_id in self.recently_accessed_journals]
+        """Returns the recently accessed journals, most recent first, with their card stats.
+
+        Ids of journals that no longer exist are skipped and pruned from the stored list.
+        """
+        from journals import recently_accessed
+
+        journal_ids = recently_accessed.get_journal_ids(self)
+        journals = self.get_associated_journals().with_card_stats().in_bulk(journal_ids)
+        stale_journal_ids = [journal_id for journal_id in journal_ids if journal_id not in journals]
+        if stale_journal_ids:
+            recently_accessed.remove_journal_ids(self, stale_journal_ids)
+        return [journals[journal_id] for journal_id in journal_ids if journal_id in journals]
 
     def full_name(self):
         """Return a string containing the user's full name."""
@@ -123,6 +183,23 @@ def profile_image_upload_path(instance, filename):
         filename = f"{uuid.uuid4().hex}.{ext}"
         return f"images/{filename}"
 
+def experience_to_reach_level(level):
+    """Total experience needed to climb from level 1 to the given level.
+
+    Each level costs level * 50 experience, so the running total is 25 * level * (level - 1).
+    Works on plain integers as well as on query expressions such as F('level').
+    """
+    return level * (level - 1) * 25
+
+def level_for_total_experience(total_experience):
+    """Returns the (level, leftover experience) reached with the given total experience."""
+    level = (1 + isqrt(1 + 4 * (total_experience // 25))) // 2
+    return level, total_experience - experience_to_reach_level(level)
+
+def level_for_total_experience_expression(total_experience):
+    """Database-side equivalent of level_for_total_experience for use in an UPDATE."""
+    return Cast(Floor((Sqrt(total_experience / 25 * 4 + 1) + 1) / 2), models.IntegerField())
+
 class Profile(models.Model):
     """Create A User Profile Model for additional User fields not used in authentication"""
 
@@ -131,38 +208,68 @@ class Profile(models.Model):
     level = models.PositiveIntegerField(default=1)
     experience = models.PositiveIntegerField(default=0)
     achievements = models.ManyToManyField(Achievement, blank=True)
+    top_achievement = models.ForeignKey(Achievement, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
 
+    LEADERBOARD_ORDERING = ('-level', '-experience', 'id')
+
+    class Meta:
+        """Model options."""
+        indexes = [
+            models.Index(fields=['level', 'experience'], name='profile_leaderboard_idx'),
+        ]
 
     def __str__(self):
         """Displays username in admin view"""
         return self.user.username
 
     def add_experience(self, amount):
-        self.experience += amount
-        while self.experience >= self.required_experience_for_next_level():
-            self.level_up()
-        self.save()
-
-    def level_up(self):
-        self.experience -= self.required_experience_for_next_level()
-        self.level += 1
-        self.save()
-        self.check_and_assign_achievements()
+        """Adds experience and applies any level ups with a single atomic UPDATE.
+
+        The new level and leftover experience are computed in the database from the
+        stored values, so concurrent calls never overwrite each other's experience.
+        """
+        from journals.leaderboard import invalidate_top_profiles_if_affected
+
+        previous_level = self.level
+        total_experience = experience_to_reach_level(F('level')) + F('experience') + amount
+        new_level = level_for_total_experience_expression(total_experience)
+        Profile.objects.filter(pk=self.pk).update(
+            level=new_level,
+            experience=total_experience - experience_to_reach_level(new_level),
+        )
+        self.refresh_from_db(fields=['level', 'experience'])
+
+        if self.level > previous_level:
+            self.check_and_assign_achievements()
+        invalidate_top_profiles_if_affected(self)
 
     def required_experience_for_next_level(self):
         return self.level * 50
 
     def check_and_assign_achievements(self):
-        for name, level in ACHIEVEMENT_LEVELS.items():
-            if self.level >= level:
-                achievement, created = Achievement.objects.get_or_create(
-                    name=name,
-                    defaults={'description': f'Reached level {self.level} in journaling!'}
-                )
-                self.achievements.add(achievement)
+        """Assigns the achievements unlocked at the current level that the profile does not hold yet."""
+        from journals.achievements import achievement_registry
+
+        unlocked_achievements = achievement_registry.get_unlocked_achievements(self.level)
+        held_achievement_ids = set(self.achievements.values_list('id', flat=True))
+
+        ProfileAchievement = Profile.achievements.through
+        ProfileAchievement.objects.bulk_create(
+            [
+                ProfileAchievement(profile_id=self.pk, achievement_id=achievement.pk)
+                for achievement in unlocked_achievements if achievement.pk not in held_achievement_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+        top_achievement = unlocked_achievements[-1] if unlocked_achievements else None
+        if top_achievement is not None and self.top_achievement_id != top_achievement.pk:
+            self.top_achievement = top_achievement
+            self.save(update_fields=['top_achievement'])
 
     def highest_achievement(self):
-        return self.achievements.order_by('-level').first()
+        """Returns the denormalized top achievement, kept up to date by check_and_assign_achievements."""
+        return self.top_achievement
 
 # Create Profile when a new user signs up
 def create_profile(sender, instance, created, **kwargs):
@@ -171,12 +278,83 @@ def create_profile(sender, instance, created, **kwargs):
         user_profile.save()
 post_save.connect(create_profile, sender=User)
 
+
+class DayNumber(models.Func):
+    """Converts a date into a whole day count, so consecutive dates differ by exactly one."""
+
+    output_field = models.IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='CAST(julianday(%(expressions)s) AS INTEGER)', **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="(%(expressions)s - DATE '1970-01-01')", **extra_context)
+
+
+class JournalQuerySet(models.QuerySet):
+
+    def with_streaks(self):
+        """Annotates every journal with its current entry streak in a single query.
+
+        Entry dates are ranked newest first; within the latest run of consecutive
+        days, day number + rank - 1 equals the newest day number (gaps and islands),
+        so the highest rank matching that condition is the length of the run.
+        """
+        yesterday = timezone.now().date() - timedelta(days=1)
+        latest_run = (
+            Entry.objects.filter(journal=OuterRef('pk'))
+            .annotate(
+                streak=Window(DenseRank(), order_by=F('date').desc()),
+                last_entry_day=Window(Max(DayNumber('date'))),
+            )
+            .filter(last_entry_day__gte=DayNumber(Value(yesterday)))
+            .filter(last_entry_day=DayNumber('date') + F('streak') - 1)
+            .order_by('-streak')
+            .values('streak')[:1]
+        )
+        return self.annotate(streak=Coalesce(Subquery(latest_run), 0))
+
+    def with_card_stats(self):
+        """Annotates the entry_count, has_today_entry and streak shown on journal cards.
+
+        last_entry_date is already stored on the journal, so it needs no annotation.
+        """
+        journal_entries = Entry.objects.filter(journal=OuterRef('pk'))
+        entry_count = journal_entries.order_by().values('journal').annotate(count=Count('pk')).values('count')
+        return self.with_streaks().annotate(
+            entry_count=Coalesce(Subquery(entry_count), 0),
+            has_today_entry=Exists(journal_entries.filter(date=date.today())),
+        )
+
     
 class Journal(models.Model):
     name = models.CharField(max_length=50) 
+    name_lower = models.CharField(max_length=100, editable=False, default='')  # Looked up by name suggestions
     owner = models.ForeignKey(User, blank=True, null=True, on_delete=models.SET_NULL, related_name='journals')
     template = models.ForeignKey('Template', on_delete=models.SET_NULL, null=True, related_name='journals')
     date = models.DateField(auto_now_add=True)
+    current_streak = models.PositiveIntegerField(default=0)
+    longest_streak = models.PositiveIntegerField(default=0)
+    last_entry_date = models.DateField(null=True, blank=True)
+    content_version = models.PositiveIntegerField(default=0)  # Bumped whenever an entry changes
+
+    objects = JournalQuerySet.as_manager()
+
+    class Meta:
+        """Model options."""
+        indexes = [
+            # The pattern opclass lets PostgreSQL use the index for LIKE 'prefix%'; other databases ignore it
+            models.Index(fields=['owner', 'name_lower'], opclasses=['', 'varchar_pattern_ops'], name='journal_owner_name_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.name_lower = self.name.lower()
+        elif 'name' in update_fields:
+            self.name_lower = self.name.lower()
+            kwargs['update_fields'] = {*update_fields, 'name_lower'}
+        super().save(*args, **kwargs)
 
     def set_name(self, newName):
         self.name = newName
@@ -202,42 +380,186 @@ class Journal(models.Model):
         
         
     def get_streak(self):
-        entries = self.entries.order_by('-date')
-        if not entries.exists():
+        """Returns the stored streak, or 0 once a full day has passed without an entry."""
+        yesterday = timezone.now().date() - timedelta(days=1)
+        if self.last_entry_date is None or self.last_entry_date < yesterday:
             return 0
-
-        # Check if there's an entry for today
-        today = timezone.now().date()
-        has_entry_today = entries.filter(date=today).exists()
-
-        # If there's no entry for today, start counting from yesterday
-        current_date = today if has_entry_today else today - timedelta(days=1)
-
-        streak = 0
-        for entry in entries:
-            if entry.date == current_date:
-                streak += 1
-                current_date -= timedelta(days=1)
-            elif streak > 0:
-                # If a streak has started but the next entry doesn't match the expected date
-                break
-
-        return streak
+        return self.current_streak
+
+    def record_entry_date(self, entry_date):
+        """Updates the streak counters for a newly created entry.
+
+        The counters are read again with the journal row locked, so entries created
+        at the same time for the same journal are all counted.
+        """
+        with transaction.atomic():
+            journal = Journal.objects.select_for_update().only(*STREAK_FIELDS).get(pk=self.pk)
+            if journal.last_entry_date is not None and entry_date < journal.last_entry_date:
+                journal.recalculate_streaks()
+            elif entry_date != journal.last_entry_date:
+                if journal.last_entry_date == entry_date - timedelta(days=1):
+                    journal.current_streak += 1
+                else:
+                    journal.current_streak = 1
+                journal.longest_streak = max(journal.longest_streak, journal.current_streak)
+                journal.last_entry_date = entry_date
+                journal.save(update_fields=STREAK_FIELDS)
+        self._copy_streaks(journal)
+
+    def recalculate_streaks(self):
+        """Rebuilds the streak counters from the journal's entries, with the journal row locked."""
+        with transaction.atomic():
+            journal = Journal.objects.select_for_update().only(*STREAK_FIELDS).get(pk=self.pk)
+            entry_dates = journal.entries.order_by('date').values_list('date', flat=True).distinct()
+            journal.current_streak, journal.longest_streak, journal.last_entry_date = calculate_streaks(entry_dates)
+            journal.save(update_fields=STREAK_FIELDS)
+        self._copy_streaks(journal)
+
+    def _copy_streaks(self, journal):
+        for field_name in STREAK_FIELDS:
+            setattr(self, field_name, getattr(journal, field_name))
+
+
+def calculate_streaks(entry_dates):
+    """Returns (current streak, longest streak, last entry date) for dates in ascending order."""
+    current_streak = longest_streak = 0
+    last_entry_date = None
+    for entry_date in entry_dates:
+        if entry_date == last_entry_date:
+            continue
+        if last_entry_date is not None and entry_date - last_entry_date == timedelta(days=1):
+            current_streak += 1
+        else:
+            current_streak = 1
+        longest_streak = max(longest_streak, current_streak)
+        last_entry_date = entry_date
+    return current_streak, longest_streak, last_entry_date
 
 
 class Entry(models.Model):
     journal = models.ForeignKey(Journal, on_delete=models.CASCADE, related_name='entries')
     entry_name = models.CharField(max_length=50, default='New Entry')
+    entry_name_lower = models.CharField(max_length=100, editable=False, default='')  # Looked up by name suggestions
     date = models.DateField(auto_now_add=True)
     responses = models.JSONField(default=list)  # Store responses as a dictionary
     mood = models.CharField(max_length=50, null=True, blank=True)  # New field for mood tracking
     multimedia_file = models.FileField(upload_to='multimedia/', null=True, blank=True)
 
+    class Meta:
+        """Model options."""
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['journal', '-date', '-id'], name='entry_journal_date_idx'),
+            models.Index(fields=['journal', 'entry_name_lower'], opclasses=['', 'varchar_pattern_ops'], name='entry_journal_name_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.entry_name_lower = self.entry_name.lower()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'entry_name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'entry_name_lower'}
+        super().save(*args, **kwargs)
+
     def get_date(self):
         return self.date
      
     
 
+def journal_export_upload_path(instance, filename):
+    return f'exports/journal_{instance.journal_id}/{filename}'
+
+
+class JournalExport(models.Model):
+    """A PDF export of a journal, built in the background."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    journal = models.ForeignKey(Journal, on_delete=models.CASCADE, related_name='exports')
+    requested_by = models.ForeignKey(User, null=True, on_delete=models.SET_NULL, related_name='+')
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)  # Percentage of entries laid out
+    file = models.FileField(upload_to=journal_export_upload_path, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Model options."""
+        indexes = [
+            models.Index(fields=['journal', 'fingerprint'], name='journal_export_lookup_idx'),
+        ]
+
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+
+class OutboundEmail(models.Model):
+    """An email waiting in the outbox to be sent by the drain_outbox task."""
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    to_email = models.EmailField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)  # Also pushed forward while a worker is sending it
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """Model options."""
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_queue_idx'),
+        ]
+
+
+class OutboxDrainLock(models.Model):
+    """Lease that lets only one drain of the outbox run at a time, so the sending rate limit holds across workers."""
+
+    holder = models.CharField(max_length=32, blank=True)
+    held_until = models.DateTimeField(default=timezone.now)
+
+
+class CacheVersion(models.Model):
+    """Version number of a cached value, stored in the database so every process sees an invalidation.
+
+    Cache keys are built from the current version, so bumping it makes all processes
+    rebuild the value even when each one has its own cache.
+    """
+
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def get_version(cls, name):
+        """Returns the current version of the named value, 0 if it was never bumped."""
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, name):
+        """Moves the named value to a new version with an atomic UPDATE."""
+        if not cls.objects.filter(name=name).update(version=F('version') + 1):
+            cls.objects.get_or_create(name=name, defaults={'version': 1})
+
+
 class Template(models.Model):
     name = models.CharField(max_length=50, default='Template Name')
     owner = models.ForeignKey(User, blank=True, null=True, on_delete=models.SET_NULL, related_name='templates')
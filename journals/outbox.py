@@ -0,0 +1,226 @@
+"""Outbox of emails to send.
+
+Code that wants to send email enqueues an OutboundEmail row, usually in the
+same transaction as the change it reports on, and the drain_outbox task sends
+the queue. A failure to reach the mail server therefore delays messages
+instead of losing them.
+
+drain_outbox() takes up to OUTBOX_BATCH_SIZE due messages at a time with
+select_for_update(skip_locked=True), so any number of workers can drain the
+queue without taking the same message. Taken messages are leased by pushing
+their next_attempt_at OUTBOX_LEASE_SECONDS ahead; if the worker dies, they
+become due again when the lease runs out. Sending is limited to
+OUTBOX_RATE_PER_SECOND by a token bucket, and a message that fails is retried
+with exponential backoff until it has been tried OUTBOX_MAX_ATTEMPTS times.
+
+Only one drain runs at a time, so overlapping runs of the task cannot add up
+to more than the rate limit: a drain holds the OutboxDrainLock lease, renewed
+before every batch, and a drain that finds it held returns straight away.
+
+Failing to connect to the mail server, or losing the connection, is not held
+against the messages: the drain stops and the unsent messages of the batch are
+released to be taken again, without using up one of their attempts.
+
+Sent messages are kept for OUTBOX_SENT_RETENTION_SECONDS and then deleted by
+purge_sent_emails().
+"""
+import smtplib
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from journals.models import OutboundEmail, OutboxDrainLock
+
+
+class TokenBucket:
+    """Allows bursts of up to capacity actions, refilled at rate per second."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+
+    def take(self):
+        """Waits until a token is available and takes it."""
+        self._refill()
+        if self.tokens < 1:
+            self.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+        self.tokens -= 1
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+def enqueue_email(subject, body, to_email):
+    return OutboundEmail.objects.create(subject=subject, body=body, to_email=to_email)
+
+
+def enqueue_emails(messages):
+    """Adds the (subject, body, to_email) messages to the outbox in one query."""
+    return OutboundEmail.objects.bulk_create(
+        [OutboundEmail(subject=subject, body=body, to_email=to_email) for subject, body, to_email in messages]
+    )
+
+
+def get_retry_delay(attempts):
+    """Returns the delay before the next attempt after the given number of failed attempts."""
+    delay = settings.OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.OUTBOX_BACKOFF_MAX_SECONDS))
+
+
+def get_outbox_depth():
+    """Returns the number of messages due now, waiting for a retry and given up on."""
+    now = timezone.now()
+    return OutboundEmail.objects.exclude(status=OutboundEmail.SENT).aggregate(
+        due=Count('id', filter=Q(status=OutboundEmail.PENDING, next_attempt_at__lte=now)),
+        waiting=Count('id', filter=Q(status=OutboundEmail.PENDING, next_attempt_at__gt=now)),
+        failed=Count('id', filter=Q(status=OutboundEmail.FAILED)),
+    )
+
+
+def drain_outbox(max_messages=None, connection_options=None, bucket=None):
+    """Sends the due messages until there are none left or max_messages have been tried.
+
+    connection_options are passed to get_connection(), for instance to send to a
+    stand-in mail server. Stops early if the mail server cannot be reached, and does
+    nothing if another drain is running. Returns the sent, retried, failed and
+    released counts, whether the drain was skipped, the seconds taken, the number
+    of messages sent per second and the remaining queue depth.
+    """
+    bucket = bucket or TokenBucket(settings.OUTBOX_RATE_PER_SECOND, settings.OUTBOX_BURST)
+    started = time.monotonic()
+    counts = {'sent': 0, 'retried': 0, 'failed': 0, 'released': 0}
+    holder = acquire_drain_lock()
+    if holder is not None:
+        try:
+            tried = 0
+            while (max_messages is None or tried < max_messages) and renew_drain_lock(holder):
+                batch_size = settings.OUTBOX_BATCH_SIZE if max_messages is None else min(settings.OUTBOX_BATCH_SIZE, max_messages - tried)
+                batch = take_due_messages(batch_size)
+                if not batch:
+                    break
+                tried += len(batch)
+                if not _send_batch(batch, connection_options or {}, bucket, counts):
+                    break
+        finally:
+            release_drain_lock(holder)
+
+    seconds = time.monotonic() - started
+    return {
+        **counts,
+        'skipped': holder is None,
+        'seconds': round(seconds, 3),
+        'per_second': round(counts['sent'] / seconds, 1) if seconds else float(counts['sent']),
+        'depth': get_outbox_depth(),
+    }
+
+
+def acquire_drain_lock():
+    """Takes the drain lease if no other drain holds it, returning the holder token or None."""
+    holder = uuid.uuid4().hex
+    now = timezone.now()
+    OutboxDrainLock.objects.get_or_create(pk=1, defaults={'held_until': now})
+    taken = OutboxDrainLock.objects.filter(pk=1, held_until__lte=now).update(
+        holder=holder, held_until=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    )
+    return holder if taken else None
+
+
+def renew_drain_lock(holder):
+    """Extends the drain lease for another OUTBOX_LEASE_SECONDS, returning False if it has been lost."""
+    held_until = timezone.now() + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    return bool(OutboxDrainLock.objects.filter(pk=1, holder=holder).update(held_until=held_until))
+
+
+def release_drain_lock(holder):
+    OutboxDrainLock.objects.filter(pk=1, holder=holder).update(holder='', held_until=timezone.now())
+
+
+def take_due_messages(batch_size):
+    """Leases up to batch_size due messages, skipping those another worker has locked."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.filter(status=OutboundEmail.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        OutboundEmail.objects.filter(id__in=[message.id for message in batch]).update(
+            next_attempt_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        )
+    return batch
+
+
+def purge_sent_emails(now=None):
+    """Deletes the messages sent more than OUTBOX_SENT_RETENTION_SECONDS ago, returning how many were deleted."""
+    sent_before = (now or timezone.now()) - timedelta(seconds=settings.OUTBOX_SENT_RETENTION_SECONDS)
+    deleted, _ = OutboundEmail.objects.filter(status=OutboundEmail.SENT, sent_at__lt=sent_before).delete()
+    return deleted
+
+
+def is_connection_error(error):
+    """Returns True if the error means the mail server cannot be reached, rather than that it refused a message."""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def _send_batch(batch, connection_options, bucket, counts):
+    """Sends the batch over one connection, returning False if the connection was lost before the end."""
+    connection = get_connection(fail_silently=False, **connection_options)
+    try:
+        connection.open()
+    except Exception:
+        # A refused login or a bad TLS setup fails every message alike, so it is not held against them
+        _release(batch, counts)
+        return False
+
+    try:
+        for index, message in enumerate(batch):
+            bucket.take()
+            try:
+                connection.send_messages([EmailMessage(message.subject, message.body, settings.DEFAULT_FROM_EMAIL, [message.to_email])])
+            except Exception as error:
+                if is_connection_error(error):
+                    _release(batch[index:], counts)
+                    return False
+                _record_failure(message, error, counts)
+            else:
+                OutboundEmail.objects.filter(pk=message.pk).update(
+                    status=OutboundEmail.SENT, attempts=message.attempts + 1, sent_at=timezone.now(), last_error=''
+                )
+                counts['sent'] += 1
+    finally:
+        try:
+            connection.close()
+        except OSError:
+            pass  # The connection may already be broken
+    return True
+
+
+def _release(messages, counts):
+    """Ends the lease of messages that were not sent, so they are due again without losing an attempt."""
+    OutboundEmail.objects.filter(id__in=[message.id for message in messages]).update(next_attempt_at=timezone.now())
+    counts['released'] += len(messages)
+
+
+def _record_failure(message, error, counts):
+    attempts = message.attempts + 1
+    if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        fields, outcome = {'status': OutboundEmail.FAILED}, 'failed'
+    else:
+        fields, outcome = {'next_attempt_at': timezone.now() + get_retry_delay(attempts)}, 'retried'
+    OutboundEmail.objects.filter(pk=message.pk).update(attempts=attempts, last_error=repr(error)[:1000], **fields)
+    counts[outcome] += 1
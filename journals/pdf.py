@@ -0,0 +1,148 @@
+"""PDF rendering of journals and entries with reportlab.
+
+The paragraph and table styles are built once per process by PDFStyles and
+shared by every document. Questions and answers are wrapped in Paragraphs so
+long text wraps inside the table, and long answers are split over several rows
+so the table can break across pages between them.
+"""
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from journals.images import get_pdf_image_path
+
+PAGE_SIZE = letter
+MARGIN = inch
+TABLE_WIDTH = PAGE_SIZE[0] - 2 * MARGIN
+QUESTION_COLUMN_WIDTH = TABLE_WIDTH * 0.35
+ANSWER_ROW_CHARACTERS = 1500  # Longer answers continue on the following rows
+
+
+class PDFStyles:
+    """The styles shared by every PDF, built on first use."""
+
+    def __init__(self):
+        sample_styles = getSampleStyleSheet()
+        self.normal = sample_styles['Normal']
+        self.title = ParagraphStyle(name='EntryTitle', fontName='Helvetica-Bold', fontSize=16, leading=20)
+        self.cell = ParagraphStyle(name='Cell', parent=self.normal)
+        self.table = TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.gray),
+                                 ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                                 ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+                                 ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                                 ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                                 ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                                 ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                                 ('GRID', (0, 0), (-1, -1), 1, colors.black)])
+
+
+_styles = None
+
+
+def get_styles():
+    global _styles
+    if _styles is None:
+        _styles = PDFStyles()
+    return _styles
+
+
+class JournalDocTemplate(SimpleDocTemplate):
+    """Document template that reports each entry as it is laid out."""
+
+    def __init__(self, *args, on_entry_laid_out=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_entry_laid_out = on_entry_laid_out
+
+    def afterFlowable(self, flowable):
+        if self.on_entry_laid_out and getattr(flowable, 'starts_entry', False):
+            self.on_entry_laid_out()
+
+
+def create_doc_template(output, **kwargs):
+    return JournalDocTemplate(
+        output, pagesize=PAGE_SIZE, leftMargin=MARGIN, rightMargin=MARGIN, topMargin=MARGIN, bottomMargin=MARGIN, **kwargs
+    )
+
+
+def render_journal_pdf(journal, output, on_progress=None):
+    """Writes the journal with all of its entries, oldest first, as a PDF to the output file.
+
+    on_progress is called with the number of entries laid out and the total.
+    Returns the number of pages written.
+    """
+    questions = journal.template.questions if journal.template else []
+    entries = journal.entries.order_by('date', 'id')
+    entry_count = entries.count()
+    laid_out = 0
+
+    def count_entry():
+        nonlocal laid_out
+        laid_out += 1
+        if on_progress:
+            on_progress(laid_out, entry_count)
+
+    doc = create_doc_template(output, on_entry_laid_out=count_entry)
+    doc.build(get_journal_elements(journal.name, entries.iterator(), questions))
+    return doc.page
+
+
+def render_entry_pdf(entry, questions, output):
+    """Writes a single entry as a PDF to the output file."""
+    elements = []
+    add_entry_details(elements, entry, questions)
+    create_doc_template(output).build(elements)
+
+
+def get_journal_elements(journal_name, entries, questions):
+    elements = [Paragraph(escape(journal_name), get_styles().normal), Spacer(1, 12)]
+    for entry in entries:
+        add_entry_details(elements, entry, questions)
+        elements.append(Spacer(1, 24))  # Add some space between entries
+    return elements
+
+
+def add_entry_details(elements, entry, questions):
+    styles = get_styles()
+    title = Paragraph(escape(entry.entry_name), styles.title)
+    title.starts_entry = True
+    elements.append(title)
+    elements.append(Spacer(1, 6))
+    elements.append(Paragraph(f"Date: {entry.date}", styles.normal))
+    elements.append(Spacer(1, 6))
+    elements.append(Paragraph(f"Mood: {escape(str(entry.mood))}", styles.normal))
+    elements.append(Spacer(1, 12))
+
+    data = [['Question', 'Response']]
+    for question, response in zip(questions, entry.responses):
+        question_cell = Paragraph(escape(str(question)), styles.cell)
+        for answer_part in split_answer(str(response or '')):
+            data.append([question_cell, Paragraph(answer_part, styles.cell)])
+            question_cell = ''
+
+    table = Table(data, colWidths=[QUESTION_COLUMN_WIDTH, TABLE_WIDTH - QUESTION_COLUMN_WIDTH], repeatRows=1)
+    table.setStyle(styles.table)
+    elements.append(table)
+
+    if entry.multimedia_file:
+        image_path = get_pdf_image_path(entry.multimedia_file)
+        if image_path:
+            elements.append(Spacer(1, 20))
+            elements.append(Image(image_path, width=300, height=300))
+            elements.append(Spacer(1, 20))
+
+
+def split_answer(answer):
+    """Splits an answer into escaped pieces of at most ANSWER_ROW_CHARACTERS, breaking at whitespace."""
+    parts = []
+    while len(answer) > ANSWER_ROW_CHARACTERS:
+        split_at = answer.rfind(' ', 0, ANSWER_ROW_CHARACTERS)
+        if split_at <= 0:
+            split_at = ANSWER_ROW_CHARACTERS
+        parts.append(answer[:split_at])
+        answer = answer[split_at:].lstrip()
+    parts.append(answer)
+    return [escape(part).replace('\n', '<br/>') for part in parts]
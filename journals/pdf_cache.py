@@ -0,0 +1,98 @@
+"""On-disk cache of rendered entry PDFs.
+
+Files are named after a hash of everything that appears in the PDF, so an
+unchanged entry is served from disk and the hash doubles as its ETag. The
+modification time of a file records when it was last used.
+
+Rendering never scans the directory. The evict_entry_pdf_cache task does,
+every few minutes, measuring the cache from the files themselves so every web
+process and worker writing to it is accounted for, and deletes the least
+recently used files until it fits in ENTRY_PDF_CACHE_MAX_BYTES. Between runs
+the cache can grow past the limit by what was rendered in the meantime.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+
+from journals.pdf import render_entry_pdf
+
+# Bump when the entry PDF layout changes so cached files are rendered again
+ENTRY_PDF_LAYOUT_VERSION = 3
+
+
+def get_entry_pdf_key(entry, questions):
+    """Returns the hash of the content of the entry's PDF."""
+    content = json.dumps([
+        ENTRY_PDF_LAYOUT_VERSION,
+        entry.entry_name,
+        entry.date.isoformat(),
+        entry.mood,
+        entry.responses,
+        questions,
+        entry.multimedia_file.name if entry.multimedia_file else None,
+    ], default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def get_entry_pdf_path(entry, questions, key=None):
+    """Returns the path of the entry's cached PDF, rendering it first if it is not cached."""
+    key = key or get_entry_pdf_key(entry, questions)
+    path = os.path.join(settings.ENTRY_PDF_CACHE_DIR, f'{key}.pdf')
+    try:
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(settings.ENTRY_PDF_CACHE_DIR, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=settings.ENTRY_PDF_CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as output:
+            render_entry_pdf(entry, questions, output)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+    return path
+
+
+def evict_least_recently_used():
+    """Deletes the least recently used PDFs until the cache fits in ENTRY_PDF_CACHE_MAX_BYTES.
+
+    Returns the number of files deleted.
+    """
+    cached_files = sorted(_get_cached_files())
+    total_size = sum(size for _, size, _ in cached_files)
+    deleted = 0
+    for _, size, path in cached_files:
+        if total_size <= settings.ENTRY_PDF_CACHE_MAX_BYTES:
+            break
+        try:
+            os.unlink(path)
+            deleted += 1
+        except FileNotFoundError:
+            pass
+        total_size -= size
+    return deleted
+
+
+def _get_cached_files():
+    """Returns the (last used time, size, path) of every cached PDF."""
+    cached_files = []
+    try:
+        directory = os.scandir(settings.ENTRY_PDF_CACHE_DIR)
+    except FileNotFoundError:
+        return cached_files
+    with directory:
+        for dir_entry in directory:
+            if not dir_entry.name.endswith('.pdf'):
+                continue
+            try:
+                stat = dir_entry.stat()
+            except FileNotFoundError:
+                continue
+            cached_files.append((stat.st_mtime, stat.st_size, dir_entry.path))
+    return cached_files
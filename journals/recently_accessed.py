@@ -0,0 +1,171 @@
+"""Tracking of the journals a user has accessed most recently.
+
+The ids are stored newest first in User.recently_accessed_journals. Writes are
+skipped when the list does not change, touch only that column, and use a
+compare-and-swap UPDATE so concurrent requests cannot overwrite each other.
+
+With RECENTLY_ACCESSED_JOURNALS_BUFFERED enabled, changes are kept in the cache
+instead and written to the database by flush_buffered_journal_ids(), which the
+flush_recently_accessed_journals task runs periodically. The Celery worker has
+to see what the web processes buffered, so buffered mode refuses to run on a
+cache that lives inside a single process. If a buffer's lock cannot be taken
+within LOCK_WAIT seconds, the change is written to the database directly.
+"""
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from django.core.exceptions import ImproperlyConfigured
+
+from journals.models import User
+
+RECENTLY_ACCESSED_JOURNALS_LIMIT = 4
+COMPARE_AND_SWAP_ATTEMPTS = 5
+BUFFERED_JOURNAL_IDS_CACHE_KEY = 'recently_accessed_journals:{user_id}'
+DIRTY_USER_IDS_CACHE_KEY = 'recently_accessed_journals:dirty_user_ids'
+BUFFER_TIMEOUT = 60 * 60 * 24
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 2
+PROCESS_LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+class CacheLockTimeout(Exception):
+    """Raised when a cache lock is still held by someone else after LOCK_WAIT seconds."""
+
+
+def is_buffered():
+    """Returns whether changes are buffered in the cache, which must then be shared between processes."""
+    if not settings.RECENTLY_ACCESSED_JOURNALS_BUFFERED:
+        return False
+    if settings.CACHES[DEFAULT_CACHE_ALIAS]['BACKEND'] in PROCESS_LOCAL_CACHE_BACKENDS:
+        raise ImproperlyConfigured(
+            'RECENTLY_ACCESSED_JOURNALS_BUFFERED needs a cache shared by the web processes and the Celery workers'
+        )
+    return True
+
+
+def get_journal_ids(user):
+    """Returns the ids of the user's recently accessed journals, newest first."""
+    if is_buffered():
+        buffered_journal_ids = cache.get(_get_buffer_key(user.pk))
+        if buffered_journal_ids is not None:
+            return buffered_journal_ids
+    return user.recently_accessed_journals or []
+
+
+def add_journal_id(user, journal_id):
+    """Moves the journal to the front of the list, keeping at most four journals."""
+    def move_to_front(journal_ids):
+        other_journal_ids = [other_id for other_id in journal_ids if other_id != journal_id]
+        return ([journal_id] + other_journal_ids)[:RECENTLY_ACCESSED_JOURNALS_LIMIT]
+
+    _update_journal_ids(user, move_to_front)
+
+
+def remove_journal_ids(user, removed_journal_ids):
+    """Removes the given journals from the list."""
+    removed_journal_ids = set(removed_journal_ids)
+    _update_journal_ids(user, lambda journal_ids: [
+        journal_id for journal_id in journal_ids if journal_id not in removed_journal_ids
+    ])
+
+
+def flush_buffered_journal_ids():
+    """Writes the buffered lists of every user with pending changes to the database.
+
+    Returns how many users were written, or 0 if the dirty set is locked and the flush is left to the next run.
+    """
+    if not is_buffered():
+        return 0
+    try:
+        with _cache_lock(DIRTY_USER_IDS_CACHE_KEY):
+            dirty_user_ids = cache.get(DIRTY_USER_IDS_CACHE_KEY, set())
+            cache.delete(DIRTY_USER_IDS_CACHE_KEY)
+    except CacheLockTimeout:
+        return 0
+
+    buffered_lists = cache.get_many([_get_buffer_key(user_id) for user_id in dirty_user_ids])
+    for user_id in dirty_user_ids:
+        journal_ids = buffered_lists.get(_get_buffer_key(user_id))
+        if journal_ids is not None:
+            User.objects.filter(pk=user_id).update(recently_accessed_journals=journal_ids)
+    return len(dirty_user_ids)
+
+
+def _update_journal_ids(user, update):
+    if is_buffered():
+        try:
+            _update_buffered_journal_ids(user, update)
+            return
+        except CacheLockTimeout:
+            pass
+    _update_stored_journal_ids(user, update)
+
+
+def _update_stored_journal_ids(user, update):
+    journal_ids = user.recently_accessed_journals
+    for _ in range(COMPARE_AND_SWAP_ATTEMPTS):
+        updated_journal_ids = update(journal_ids or [])
+        if updated_journal_ids == journal_ids:
+            return
+
+        unchanged_since_read = User.objects.filter(pk=user.pk, **_get_stored_journal_ids_lookup(journal_ids))
+        if unchanged_since_read.update(recently_accessed_journals=updated_journal_ids):
+            user.recently_accessed_journals = updated_journal_ids
+            return
+
+        journal_ids = User.objects.values_list('recently_accessed_journals', flat=True).get(pk=user.pk)
+        user.recently_accessed_journals = journal_ids
+
+
+def _get_stored_journal_ids_lookup(journal_ids):
+    if journal_ids is None:
+        return {'recently_accessed_journals__isnull': True}
+    return {'recently_accessed_journals': journal_ids}
+
+
+def _update_buffered_journal_ids(user, update):
+    buffer_key = _get_buffer_key(user.pk)
+    with _cache_lock(buffer_key):
+        journal_ids = cache.get(buffer_key)
+        if journal_ids is None:
+            journal_ids = user.recently_accessed_journals or []
+        updated_journal_ids = update(journal_ids)
+        if updated_journal_ids == journal_ids:
+            return
+        cache.set(buffer_key, updated_journal_ids, BUFFER_TIMEOUT)
+
+    with _cache_lock(DIRTY_USER_IDS_CACHE_KEY):
+        dirty_user_ids = cache.get(DIRTY_USER_IDS_CACHE_KEY, set())
+        dirty_user_ids.add(user.pk)
+        cache.set(DIRTY_USER_IDS_CACHE_KEY, dirty_user_ids, None)
+
+
+def _get_buffer_key(user_id):
+    return BUFFERED_JOURNAL_IDS_CACHE_KEY.format(user_id=user_id)
+
+
+@contextmanager
+def _cache_lock(key):
+    """Serialises read-modify-write cycles on a cache key across processes.
+
+    Raises CacheLockTimeout after LOCK_WAIT seconds. The lock holds a token of its holder,
+    so a holder whose lock has expired does not release the lock of the next one.
+    """
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    give_up_at = time.monotonic() + LOCK_WAIT
+    while not cache.add(lock_key, token, LOCK_TIMEOUT):
+        if time.monotonic() >= give_up_at:
+            raise CacheLockTimeout(lock_key)
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
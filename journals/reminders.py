@@ -0,0 +1,140 @@
+"""Daily reminder emails.
+
+A user is reminded when they have journals but have not written an entry
+dated today, and the email names the journals still missing today's entry.
+
+Users choose the local hour of their reminder. User.reminder_utc_hour holds
+that hour in UTC and the send_reminder_emails task runs every hour for the
+users of the current UTC hour only, so sending is spread over the whole day.
+Since the UTC hour of a time zone moves with daylight saving time, each run
+first brings the stored hours up to date with refresh_reminder_utc_hours().
+
+Time zones sharing a UTC hour can be on different dates, so a run reminds
+each time zone of the hour for its own local date. Entries are stamped with
+the date in the server's TIME_ZONE, and get_entry_dates() turns a local date
+into the entry dates that overlap it: an entry on any of them counts as
+written that day.
+
+A run splits the id space of its users into ranges of REMINDER_CHUNK_SIZE ids
+and sends each range from its own send_reminder_chunk task, so the work
+spreads over every worker.
+
+A chunk marks its users as reminded by setting User.last_reminded_on to the
+day of the run in the same transaction that puts their emails in the outbox,
+so a retried or duplicated chunk skips the users that have already been
+reminded that day. Sending, and retrying what fails, is left to the outbox.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, Min, OuterRef, Q
+from django.utils import timezone
+
+from journals.models import Entry, Journal, User, get_reminder_utc_hour, get_time_zone
+from journals.outbox import enqueue_emails
+
+REMINDER_SUBJECT = 'Daily Journal Reminder'
+REMINDER_BODY = 'Hi there, it looks like you haven\'t written in these journals today:\n\n{journal_names}\n\nDon\'t forget to log in and keep your journals updated!'
+
+
+def get_users_to_remind(day=None, utc_hour=None, time_zone=None):
+    """Returns the users who have journals but no entry written on the day and have not been reminded on it, by id.
+
+    With a utc_hour, only the users whose reminder falls in that UTC hour are returned, and with a
+    time_zone only the users in it, the day being their local date.
+    """
+    day = day or (get_local_date(time_zone) if time_zone else timezone.localdate())
+    users = User.objects.all() if utc_hour is None else User.objects.filter(reminder_utc_hour=utc_hour)
+    if time_zone is not None:
+        users = users.filter(time_zone=time_zone)
+    return (
+        users.filter(
+            Exists(Journal.objects.filter(owner=OuterRef('pk'))),
+            ~Exists(Entry.objects.filter(journal__owner=OuterRef('pk'), date__range=get_entry_dates(day, time_zone))),
+            is_active=True,
+        )
+        .filter(Q(last_reminded_on__isnull=True) | Q(last_reminded_on__lt=day))
+        .exclude(email='')
+        .order_by('id')
+    )
+
+
+def get_local_date(time_zone, now=None):
+    return (now or timezone.now()).astimezone(get_time_zone(time_zone)).date()
+
+
+def get_entry_dates(day, time_zone=None):
+    """Returns the first and last dates an entry written on the day in the time zone can be stamped with.
+
+    Entries are stamped with the date in the server's TIME_ZONE, which is the day itself when no
+    time zone is given.
+    """
+    if time_zone is None:
+        return day, day
+    zone = get_time_zone(time_zone)
+    start = datetime.combine(day, time.min, tzinfo=zone)
+    end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=zone) - timedelta(microseconds=1)
+    return timezone.localdate(start), timezone.localdate(end)
+
+
+def get_reminder_days(utc_hour, now=None):
+    """Returns the (time zone, local date) of every time zone with reminders in the UTC hour."""
+    now = now or timezone.now()
+    time_zones = User.objects.filter(reminder_utc_hour=utc_hour).values_list('time_zone', flat=True).order_by('time_zone').distinct()
+    return [(time_zone, get_local_date(time_zone, now)) for time_zone in time_zones]
+
+
+def refresh_reminder_utc_hours():
+    """Updates the reminder UTC hours of the time zones whose offset has changed, returning how many users moved."""
+    moved = 0
+    reminder_times = User.objects.values_list('time_zone', 'reminder_hour', 'reminder_utc_hour').order_by().distinct()
+    for time_zone, reminder_hour, reminder_utc_hour in reminder_times:
+        utc_hour = get_reminder_utc_hour(time_zone, reminder_hour)
+        if utc_hour != reminder_utc_hour:
+            moved += User.objects.filter(time_zone=time_zone, reminder_hour=reminder_hour).update(reminder_utc_hour=utc_hour)
+    return moved
+
+
+def get_reminder_chunks(day, utc_hour=None, time_zone=None, chunk_size=None):
+    """Returns the (start, end) user id ranges, end excluded, covering every user to remind on the day."""
+    chunk_size = chunk_size or settings.REMINDER_CHUNK_SIZE
+    id_range = get_users_to_remind(day, utc_hour, time_zone).aggregate(first_id=Min('id'), last_id=Max('id'))
+    if id_range['first_id'] is None:
+        return []
+    return [(start, start + chunk_size) for start in range(id_range['first_id'], id_range['last_id'] + 1, chunk_size)]
+
+
+def send_reminder_chunk(start_id, end_id, day, utc_hour=None, time_zone=None):
+    """Queues reminders for the users with ids from start_id up to end_id who have not been reminded on the day yet.
+
+    Returns the number of reminders queued.
+    """
+    with transaction.atomic():
+        users = get_users_to_remind(day, utc_hour, time_zone).filter(id__gte=start_id, id__lt=end_id).select_for_update()
+        claimed = list(users.values_list('id', 'email'))
+        user_ids = [user_id for user_id, _ in claimed]
+        User.objects.filter(id__in=user_ids).update(last_reminded_on=day)
+        journal_names = get_journal_names_without_entry(day, user_ids, time_zone)
+        enqueue_emails(
+            (REMINDER_SUBJECT, get_reminder_body(journal_names.get(user_id, [])), email) for user_id, email in claimed
+        )
+    return len(claimed)
+
+
+def get_journal_names_without_entry(day, user_ids, time_zone=None):
+    """Returns the names of the users' journals that have no entry written on the day, by user id."""
+    journals = (
+        Journal.objects.filter(owner_id__in=user_ids)
+        .filter(~Exists(Entry.objects.filter(journal=OuterRef('pk'), date__range=get_entry_dates(day, time_zone))))
+        .order_by('owner_id', 'name')
+        .values_list('owner_id', 'name')
+    )
+    journal_names = {}
+    for owner_id, name in journals:
+        journal_names.setdefault(owner_id, []).append(name)
+    return journal_names
+
+
+def get_reminder_body(journal_names):
+    return REMINDER_BODY.format(journal_names='\n'.join(f'- {name}' for name in journal_names))
@@ -0,0 +1,286 @@
+"""Full-text search over entry names and responses.
+
+The index lives in a side table keyed by entry id: an FTS5 virtual table on
+SQLite and a table with a GIN indexed tsvector column on PostgreSQL. It is kept
+in sync by the Entry post_save/post_delete signals and can be rebuilt from
+scratch with the rebuildsearchindex command.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import TruncMonth
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+SEARCH_TABLE = 'journals_entry_search'
+SEARCH_CONFIG = 'english'
+MAX_SEARCH_TERMS = 10
+# Ranks are compared as integers in millionths, so a page cursor holds the exact sort key of its last entry
+RANK_SCALE = 1000000
+SNIPPET_WORDS = 12
+INDEXED_FIELDS = {'entry_name', 'responses'}
+# Facet and filter value of the entries without a mood, stored as either NULL or ''
+NO_MOOD = 'none'
+
+# Private use characters wrap the matched words in snippets so user text can be
+# escaped before the markers are turned into <mark> tags.
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_END = '\ue001'
+
+
+class SqliteEntrySearchBackend:
+    """Entry search backed by an FTS5 table whose rowid is the entry id."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+                f"USING fts5(entry_name, responses, tokenize='porter unicode61')"
+            )
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def clear_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+    def index_entries(self, entries):
+        rows = [(entry.id, entry.entry_name, get_responses_text(entry.responses)) for entry in entries]
+        if not rows:
+            return
+        self.remove_entries([entry_id for entry_id, _, _ in rows])
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, entry_name, responses) VALUES (%s, %s, %s)', rows
+            )
+
+    def remove_entries(self, entry_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(entry_id,) for entry_id in entry_ids])
+
+    def search(self, entries, terms, after=None, limit=None):
+        """Returns (entry id, rank, snippet) rows for the matching entries, best match first."""
+        rank = f'CAST(round(bm25({SEARCH_TABLE}, 10.0, 1.0) * {RANK_SCALE}) AS INTEGER)'
+        entry_ids_sql, entry_ids_params = _get_entry_ids_sql(entries)
+        sql = (
+            f"SELECT entry_id, rank, snippet FROM ("
+            f"SELECT rowid AS entry_id, {rank} AS rank, snippet({SEARCH_TABLE}, -1, %s, %s, '…', %s) AS snippet "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND rowid IN ({entry_ids_sql})"
+            f") ranked"
+        )
+        params = [HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_WORDS, self._get_match_query(terms), *entry_ids_params]
+        if after is not None:
+            sql += ' WHERE rank > %s OR (rank = %s AND entry_id < %s)'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY rank, entry_id DESC LIMIT %s'
+        params.append(-1 if limit is None else limit)
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def get_matching_entry_ids(self, terms):
+        return RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [self._get_match_query(terms)])
+
+    def _get_match_query(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+
+class PostgresEntrySearchBackend:
+    """Entry search backed by a tsvector column with a GIN index."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                f"entry_id bigint PRIMARY KEY REFERENCES journals_entry (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                f"content text NOT NULL, "
+                f"document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_idx ON {SEARCH_TABLE} USING GIN (document)'
+            )
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def clear_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {SEARCH_TABLE}')
+
+    def index_entries(self, entries):
+        rows = []
+        for entry in entries:
+            responses_text = get_responses_text(entry.responses)
+            rows.append((entry.id, f'{entry.entry_name} {responses_text}', entry.entry_name, responses_text))
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (entry_id, content, document) VALUES (%s, %s, "
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', %s), 'A') || setweight(to_tsvector('{SEARCH_CONFIG}', %s), 'B')) "
+                f"ON CONFLICT (entry_id) DO UPDATE SET content = EXCLUDED.content, document = EXCLUDED.document",
+                rows
+            )
+
+    def remove_entries(self, entry_ids):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE entry_id = ANY(%s)', [list(entry_ids)])
+
+    def search(self, entries, terms, after=None, limit=None):
+        """Returns (entry id, rank, snippet) rows for the matching entries, best match first."""
+        entry_ids_sql, entry_ids_params = _get_entry_ids_sql(entries)
+        sql = (
+            f"SELECT entry_id, rank, ts_headline('{SEARCH_CONFIG}', content, query, %s) FROM ("
+            f"SELECT entry_id, round(-ts_rank_cd(document, query) * {RANK_SCALE})::bigint AS rank, content, query "
+            f"FROM {SEARCH_TABLE}, to_tsquery('{SEARCH_CONFIG}', %s) query "
+            f"WHERE document @@ query AND entry_id IN ({entry_ids_sql})"
+            f") ranked"
+        )
+        params = [
+            f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords={SNIPPET_WORDS}, MinWords=5',
+            self._get_tsquery(terms),
+            *entry_ids_params,
+        ]
+        if after is not None:
+            sql += ' WHERE rank > %s OR (rank = %s AND entry_id < %s)'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY rank, entry_id DESC LIMIT %s'
+        params.append(limit)
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def get_matching_entry_ids(self, terms):
+        return RawSQL(
+            f"SELECT entry_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('{SEARCH_CONFIG}', %s)",
+            [self._get_tsquery(terms)]
+        )
+
+    def _get_tsquery(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SqliteEntrySearchBackend,
+    'postgresql': PostgresEntrySearchBackend,
+}
+
+
+def get_entry_search_backend(using=None):
+    """Returns the search backend for the connection, or None if its database is not supported."""
+    using = using or connection
+    backend_class = SEARCH_BACKENDS.get(using.vendor)
+    return backend_class(using) if backend_class else None
+
+
+def get_search_terms(query):
+    """Splits a user query into the words to match, dropping any search syntax."""
+    return re.findall(r'[^\W_]+', query.lower())[:MAX_SEARCH_TERMS]
+
+
+def get_responses_text(responses):
+    """Joins the answers of an entry into one searchable string."""
+    if isinstance(responses, dict):
+        responses = responses.values()
+    return ' '.join(str(response) for response in responses or [] if response)
+
+
+def index_entry(entry):
+    backend = get_entry_search_backend()
+    if backend:
+        backend.index_entries([entry])
+
+
+def remove_entry(entry_id):
+    backend = get_entry_search_backend()
+    if backend:
+        backend.remove_entries([entry_id])
+
+
+def search_entries(entries, query, cursor=None, page_size=None):
+    """Returns a page of the entries matching the query, best match first, and the cursor of the following page.
+
+    Each entry carries a search_snippet with the matched words wrapped in <mark>.
+    """
+    backend = get_entry_search_backend()
+    page_size = page_size or settings.ENTRIES_PAGE_SIZE
+    rows = backend.search(entries, get_search_terms(query), _parse_search_cursor(cursor), page_size + 1)
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        entry_id, rank, _ = rows[-1]
+        next_cursor = f'{rank}_{entry_id}'
+
+    entries_by_id = entries.in_bulk([entry_id for entry_id, _, _ in rows])
+    page = []
+    for entry_id, _, snippet in rows:
+        if entry_id in entries_by_id:
+            entry = entries_by_id[entry_id]
+            entry.search_snippet = highlight_snippet(snippet)
+            page.append(entry)
+    return page, next_cursor
+
+
+def filter_matching_entries(entries, query):
+    """Narrows the entries down to the ones matching the query, for counting and aggregating."""
+    terms = get_search_terms(query)
+    return entries.filter(id__in=get_entry_search_backend().get_matching_entry_ids(terms))
+
+
+def get_search_facets(entries):
+    """Counts the entries per journal, mood and month with one grouped query."""
+    rows = (
+        entries.order_by()
+        .values('journal_id', 'journal__name', 'mood', month=TruncMonth('date'))
+        .annotate(entry_count=Count('id'))
+    )
+    journals, moods, months = {}, {}, {}
+    for row in rows:
+        journal = journals.setdefault(row['journal_id'], {'value': row['journal_id'], 'label': row['journal__name'], 'count': 0})
+        journal['count'] += row['entry_count']
+        mood_value = row['mood'] or NO_MOOD
+        mood = moods.setdefault(mood_value, {'value': mood_value, 'label': row['mood'] or 'No mood', 'count': 0})
+        mood['count'] += row['entry_count']
+        month = months.setdefault(row['month'], {'value': row['month'], 'label': row['month'].strftime('%B %Y'), 'count': 0})
+        month['count'] += row['entry_count']
+    return {
+        'journals': sorted(journals.values(), key=lambda facet: (-facet['count'], facet['label'])),
+        'moods': sorted(moods.values(), key=lambda facet: (-facet['count'], facet['label'])),
+        'months': sorted(months.values(), key=lambda facet: facet['value'], reverse=True),
+    }
+
+
+def can_search(query):
+    """Returns whether the query can be answered from the full-text index."""
+    return get_entry_search_backend() is not None and bool(get_search_terms(query))
+
+
+def highlight_snippet(snippet):
+    """Escapes a snippet and turns the highlight markers into <mark> tags."""
+    return mark_safe(
+        escape(snippet or '').replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+def _get_entry_ids_sql(entries):
+    return entries.order_by().values('id').query.sql_with_params()
+
+
+def _parse_search_cursor(cursor):
+    try:
+        rank, entry_id = cursor.rsplit('_', 1)
+        return int(rank), int(entry_id)
+    except (AttributeError, ValueError):
+        return None
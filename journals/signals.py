@@ -1,6 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
-from .models import Entry, Journal
+from .achievements import achievement_registry
+from .exports import record_journal_change
+from .images import delete_pdf_image
+from .leaderboard import invalidate_top_profiles_if_affected
+from .models import Achievement, Entry, Journal, Profile
+from .search import INDEXED_FIELDS, index_entry, remove_entry
+from .suggestions import invalidate_suggestions
 
 @receiver(post_save, sender=Entry)
 def update_experience_for_entry(sender, instance, created, **kwargs):
@@ -8,7 +14,75 @@ def update_experience_for_entry(sender, instance, created, **kwargs):
     if created:
         profile = instance.journal.owner.profile
         profile.add_experience(50)
-        profile.save()
+
+@receiver(post_save, sender=Entry)
+def update_streak_for_new_entry(sender, instance, created, **kwargs):
+    """ Extend the journal's stored streak with a new Entry """
+    if created:
+        instance.journal.record_entry_date(instance.date)
+
+@receiver(post_delete, sender=Entry)
+def update_streak_for_deleted_entry(sender, instance, origin=None, **kwargs):
+    """ Rebuild the journal's stored streak after an Entry is deleted """
+    if isinstance(origin, Journal):
+        return
+    instance.journal.recalculate_streaks()
+
+@receiver(post_save, sender=Entry)
+def update_search_index_for_entry(sender, instance, update_fields=None, **kwargs):
+    """ Reindex the Entry's name and responses """
+    if update_fields is None or INDEXED_FIELDS.intersection(update_fields):
+        index_entry(instance)
+
+@receiver(post_delete, sender=Entry)
+def remove_deleted_entry_from_search_index(sender, instance, **kwargs):
+    """ Drop a deleted Entry from the search index """
+    remove_entry(instance.id)
+
+@receiver(post_save, sender=Entry)
+@receiver(post_delete, sender=Entry)
+def refresh_suggestions_for_entry(sender, instance, update_fields=None, origin=None, **kwargs):
+    """ Make the owner's cached suggestions stale after an Entry is added, renamed or deleted """
+    if isinstance(origin, Journal):
+        return
+    if update_fields is None or 'entry_name' in update_fields:
+        invalidate_suggestions(instance.journal.owner_id)
+
+@receiver(post_save, sender=Journal)
+@receiver(post_delete, sender=Journal)
+def refresh_suggestions_for_journal(sender, instance, update_fields=None, **kwargs):
+    """ Make the owner's cached suggestions stale after a Journal is added, renamed or deleted """
+    if update_fields is None or 'name' in update_fields:
+        invalidate_suggestions(instance.owner_id)
+
+@receiver(post_save, sender=Entry)
+@receiver(post_delete, sender=Entry)
+def mark_journal_exports_out_of_date(sender, instance, origin=None, **kwargs):
+    """ Make the next export of the journal include the changed Entry """
+    if isinstance(origin, Journal):
+        return
+    record_journal_change(instance.journal_id)
+
+@receiver(post_init, sender=Entry)
+def remember_multimedia_file_name(sender, instance, **kwargs):
+    """ Keep the attachment's stored name so a replaced attachment can be noticed on save """
+    saved_file = instance.__dict__.get('multimedia_file') or ''
+    instance._saved_multimedia_file_name = getattr(saved_file, 'name', saved_file) or ''
+
+@receiver(post_save, sender=Entry)
+def delete_pdf_image_of_replaced_attachment(sender, instance, **kwargs):
+    """ Delete the PDF sized copy of an attachment that was replaced or removed """
+    saved_name = instance._saved_multimedia_file_name
+    current_name = instance.multimedia_file.name or ''
+    if saved_name and saved_name != current_name:
+        delete_pdf_image(instance.multimedia_file.storage, saved_name)
+    instance._saved_multimedia_file_name = current_name
+
+@receiver(post_delete, sender=Entry)
+def delete_pdf_image_of_deleted_entry(sender, instance, **kwargs):
+    """ Delete the PDF sized copy of a deleted Entry's attachment """
+    if instance.multimedia_file:
+        delete_pdf_image(instance.multimedia_file.storage, instance.multimedia_file.name)
 
 @receiver(post_save, sender=Journal)
 def update_experience_for_journal(sender, instance, created, **kwargs):
@@ -17,4 +91,14 @@ def update_experience_for_journal(sender, instance, created, **kwargs):
         
         profile = instance.owner.profile
         profile.add_experience(100)
-        profile.save()
\ No newline at end of file
+
+@receiver(post_delete, sender=Profile)
+def remove_deleted_profile_from_leaderboard(sender, instance, **kwargs):
+    """ Drop the cached leaderboard if a listed profile is deleted """
+    invalidate_top_profiles_if_affected(instance)
+
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+def refresh_achievement_registry(sender, **kwargs):
+    """ Reload the cached achievements after one is changed """
+    achievement_registry.refresh()
@@ -0,0 +1,99 @@
+"""Typeahead suggestions for the names of a user's journals and entries.
+
+Each lookup is a prefix query limited to SUGGESTIONS_LIMIT names: journal names
+over the user's journals, and entry names over the entries of the one journal
+being edited. It runs on the lowercased copies of the names, Journal.name_lower
+and Entry.entry_name_lower, through their (owner, name) and (journal, name)
+indexes: PostgreSQL uses LIKE 'prefix%' with the varchar_pattern_ops index,
+and other databases, whose LIKE cannot use a plain index, the range of values
+that start with the prefix. Answers are cached per
+prefix under a version number of the user's names, stored as a CacheVersion so
+every process sees it, which the Journal and Entry signals bump whenever a name
+changes, so stale answers are never read again. The sidebar fragments build
+their ETags from the same version.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max
+
+from journals.models import CacheVersion, Entry, Journal
+
+SUGGESTIONS_CACHE_KEY = 'suggestions:{user_id}:{version}:{journal_id}:{suggestion_type}:{prefix}'
+NAMES_CACHE_VERSION = 'names:{user_id}'
+MAX_PREFIX_LENGTH = 50
+
+
+def get_suggestions(user, prefix, suggestion_type=None, journal_id=None, limit=None):
+    """Returns the user's journal names, and the names of the journal's entries, starting with the prefix, in name order.
+
+    Entry names are only suggested within the given journal, and names shared by
+    several entries are suggested once, for the newest entry.
+    """
+    prefix = normalise_prefix(prefix)
+    if not prefix:
+        return []
+
+    limit = limit or settings.SUGGESTIONS_LIMIT
+    cache_key = SUGGESTIONS_CACHE_KEY.format(
+        user_id=user.pk, version=get_names_version(user.pk), journal_id=journal_id,
+        suggestion_type=suggestion_type, prefix=hashlib.sha256(prefix.encode()).hexdigest(),
+    )
+    suggestions = cache.get(cache_key)
+    if suggestions is None:
+        suggestions = _find_suggestions(user, prefix, suggestion_type, journal_id, limit)
+        cache.set(cache_key, suggestions, settings.SUGGESTIONS_CACHE_TIMEOUT)
+    return suggestions
+
+
+def get_names_version(user_id):
+    """Returns the version of the user's journal and entry names, which changes whenever one of them does."""
+    return CacheVersion.get_version(NAMES_CACHE_VERSION.format(user_id=user_id))
+
+
+def invalidate_suggestions(user_id):
+    """Makes every cached suggestion, and sidebar fragment ETag, of the user stale."""
+    CacheVersion.bump(NAMES_CACHE_VERSION.format(user_id=user_id))
+
+
+def normalise_prefix(prefix):
+    return (prefix or '').lstrip()[:MAX_PREFIX_LENGTH].lower()
+
+
+def starting_with(field_name, prefix):
+    """Returns the lookups matching the values of the lowercased field that start with the lowercased prefix."""
+    if connection.vendor == 'postgresql':
+        return {f'{field_name}__startswith': prefix}
+    lookups = {f'{field_name}__gte': prefix}
+    next_code_point = ord(prefix[-1]) + 1
+    if 0xD800 <= next_code_point <= 0xDFFF:
+        next_code_point = 0xE000  # Surrogates cannot be encoded, and no character sorts between them
+    if next_code_point <= 0x10FFFF:
+        lookups[f'{field_name}__lt'] = prefix[:-1] + chr(next_code_point)
+    return lookups
+
+
+def _find_suggestions(user, prefix, suggestion_type, journal_id, limit):
+    suggestions = []
+    if suggestion_type in (None, 'journal'):
+        journals = (
+            Journal.objects.filter(owner=user, **starting_with('name_lower', prefix))
+            .order_by('name_lower', 'name')
+            .values_list('id', 'name')[:limit]
+        )
+        suggestions += [{'type': 'journal', 'id': journal_id, 'name': name} for journal_id, name in journals]
+    if suggestion_type in (None, 'entry') and journal_id is not None:
+        entries = (
+            Entry.objects.filter(journal_id=journal_id, journal__owner=user, **starting_with('entry_name_lower', prefix))
+            .values('entry_name_lower', 'entry_name')
+            .annotate(newest_id=Max('id'))
+            .order_by('entry_name_lower', 'entry_name')[:limit]
+        )
+        suggestions += [
+            {'type': 'entry', 'id': entry['newest_id'], 'journal_id': journal_id, 'name': entry['entry_name']}
+            for entry in entries
+        ]
+    suggestions.sort(key=lambda suggestion: (suggestion['name'].casefold(), suggestion['type'], suggestion['name']))
+    return suggestions[:limit]
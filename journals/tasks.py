@@ -1,30 +1,70 @@
-from celery import shared_task
-from django.core.mail import send_mail
-from django.conf import settings
-from journals.models import User
-
-
-def should_send_reminder(user):
-    """Check if a reminder should be sent to the user."""
-    return not user.has_logged_in_last_24_hours()
-
-def send_reminder_email(user):
-    """Send a reminder email to the user."""
-    send_mail(
-        'Daily Journal Reminder',
-        'Hi there, it looks like you haven\'t filled in your journal in the last 24 hours. Don\'t forget to log in and keep your journal updated!',
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        fail_silently=False,
+import logging
+from datetime import date
+from celery import chord, shared_task
+from django.utils import timezone
+from journals import outbox
+from journals.archive import delete_expired_archives
+from journals.exports import run_journal_export
+from journals.pdf_cache import evict_least_recently_used
+from journals.recently_accessed import flush_buffered_journal_ids
+from journals.reminders import get_reminder_chunks, get_reminder_days, refresh_reminder_utc_hours, send_reminder_chunk
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def send_reminder_emails(utc_hour=None):
+    """Split the users whose reminder falls in the UTC hour, the current one by default, into id ranges and remind each range in its own task
+
+    The users of each time zone are reminded for their own local date. Once every range has been queued, the outbox is drained.
+    """
+    now = timezone.now()
+    utc_hour = now.hour if utc_hour is None else utc_hour
+    refresh_reminder_utc_hours()
+    chunks = [
+        send_reminder_emails_chunk.s(start_id, end_id, day.isoformat(), utc_hour, time_zone)
+        for time_zone, day in get_reminder_days(utc_hour, now)
+        for start_id, end_id in get_reminder_chunks(day, utc_hour, time_zone)
+    ]
+    if chunks:
+        chord(chunks)(drain_outbox.si())
+    return {'utc_hour': utc_hour, 'chunks': len(chunks)}
+
+@shared_task(acks_late=True)
+def send_reminder_emails_chunk(start_id, end_id, day, utc_hour=None, time_zone=None):
+    """Queue reminders for the users of the time zone in an id range who have not been reminded on their local day yet"""
+    return send_reminder_chunk(start_id, end_id, date.fromisoformat(day), utc_hour, time_zone)
+
+@shared_task
+def drain_outbox():
+    """Send the due emails in the outbox"""
+    report = outbox.drain_outbox()
+    logger.info(
+        'Outbox sent: %s, retried: %s, failed: %s, released: %s, in %ss (%s per second), queue depth: %s',
+        report['sent'], report['retried'], report['failed'], report['released'], report['seconds'], report['per_second'], report['depth'],
     )
+    return report
+
+@shared_task
+def purge_sent_emails():
+    """Delete the sent emails that are past their retention"""
+    return outbox.purge_sent_emails()
+
+@shared_task
+def flush_recently_accessed_journals():
+    """Write buffered recently accessed journals to the database"""
+    return flush_buffered_journal_ids()
+
+@shared_task
+def delete_expired_archive_exports():
+    """Delete the saved archives that have expired and the partial ones that were abandoned"""
+    return delete_expired_archives()
+
+@shared_task
+def evict_entry_pdf_cache():
+    """Delete the least recently used cached entry PDFs until the cache fits in its size limit"""
+    return evict_least_recently_used()
 
 @shared_task
-def send_reminder_emails():
-    """Loop through users and send reminder email"""
-    print("STARTED")
-    users = User.objects.all()
-    for user in users:
-        if should_send_reminder(user):
-            send_reminder_email(user)
-
-    print("DONE")
\ No newline at end of file
+def export_journal_pdf(export_id):
+    """Render a journal PDF export and save it to media storage"""
+    run_journal_export(export_id)
@@ -48,3 +48,17 @@ class UserFormTestCase(TestCase):
         self.assertEqual(user.first_name, 'Jane')
         self.assertEqual(user.last_name, 'Doe')
         self.assertEqual(user.email, 'janedoe@example.org')
+
+    def test_form_saves_the_reminder_time(self):
+        user = User.objects.get(username='@johndoe')
+        self.form_input.update({'time_zone': 'America/New_York', 'reminder_hour': '7'})
+        form = UserForm(instance=user, data=self.form_input)
+        form.save()
+        user.refresh_from_db()
+        self.assertEqual((user.time_zone, user.reminder_hour), ('America/New_York', 7))
+        self.assertIn(user.reminder_utc_hour, (11, 12))
+
+    def test_form_rejects_unknown_time_zone(self):
+        self.form_input['time_zone'] = 'Mars/Olympus_Mons'
+        form = UserForm(data=self.form_input)
+        self.assertFalse(form.is_valid())
@@ -1,3 +1,6 @@
+import tempfile
+
+from django.test import override_settings
 from django.urls import reverse
 from with_asserts.mixin import AssertHTMLMixin
 
@@ -7,6 +10,24 @@ def reverse_with_next(url_name, next_url):
     url += f"?next={next_url}"
     return url
 
+def use_temporary_directory(test_case, *setting_names):
+    """Points the settings at a temporary directory that is deleted when the test ends"""
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+    settings_override = override_settings(**{setting_name: directory.name for setting_name in setting_names})
+    settings_override.enable()
+    test_case.addCleanup(settings_override.disable)
+    return directory.name
+
+def use_temporary_class_directory(test_class, *setting_names):
+    """Points the settings at a temporary directory that is deleted when the test class ends"""
+    directory = tempfile.TemporaryDirectory()
+    test_class.addClassCleanup(directory.cleanup)
+    settings_override = override_settings(**{setting_name: directory.name for setting_name in setting_names})
+    settings_override.enable()
+    test_class.addClassCleanup(settings_override.disable)
+    return directory.name
+
 
 class LogInTester:
     """Class support login in tests."""
@@ -1,8 +1,12 @@
 """Unit tests for the Journal model."""
-from datetime import datetime
+from datetime import date, datetime
+from unittest import skipUnless
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
-from journals.models import Entry, Journal, User
+from journals.models import DayNumber, Entry, Journal, User, calculate_streaks
+from io import StringIO
 from django.utils import timezone
 from datetime import timedelta
 
@@ -100,6 +104,125 @@ class JournalModelTests(TestCase):
         streak = self.journal.get_streak()
         self.assertEqual(streak, 1)
 
+    def test_get_streak_does_not_query_the_database(self):
+        Entry.objects.create(journal=self.journal)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.journal.get_streak(), 1)
+
+    def test_record_entry_date_extends_streak_on_consecutive_days(self):
+        today = timezone.now().date()
+        for days_ago in (3, 2, 1, 0):
+            self.journal.record_entry_date(today - timedelta(days=days_ago))
+        self.journal.refresh_from_db()
+        self.assertEqual(self.journal.current_streak, 4)
+        self.assertEqual(self.journal.longest_streak, 4)
+        self.assertEqual(self.journal.last_entry_date, today)
+
+    def test_record_entry_date_restarts_streak_after_gap(self):
+        today = timezone.now().date()
+        for days_ago in (5, 4, 3, 0):
+            self.journal.record_entry_date(today - timedelta(days=days_ago))
+        self.assertEqual(self.journal.get_streak(), 1)
+        self.assertEqual(self.journal.longest_streak, 3)
+
+    def test_record_entry_date_counts_updates_made_through_another_instance(self):
+        today = timezone.now().date()
+        Journal.objects.filter(pk=self.journal.pk).update(current_streak=0, longest_streak=0, last_entry_date=None)
+        first_request_journal = Journal.objects.get(pk=self.journal.pk)
+        second_request_journal = Journal.objects.get(pk=self.journal.pk)
+        first_request_journal.record_entry_date(today - timedelta(days=1))
+        second_request_journal.record_entry_date(today)
+
+        self.assertEqual(second_request_journal.current_streak, 2)
+        self.journal.refresh_from_db()
+        self.assertEqual((self.journal.current_streak, self.journal.longest_streak, self.journal.last_entry_date), (2, 2, today))
+
+    def test_get_streak_is_zero_after_a_missed_day(self):
+        self.journal.record_entry_date(timezone.now().date() - timedelta(days=2))
+        self.assertEqual(self.journal.get_streak(), 0)
+
+    def test_deleting_entry_recalculates_streak(self):
+        entry = Entry.objects.create(journal=self.journal)
+        entry.delete()
+        self.journal.refresh_from_db()
+        self.assertEqual(self.journal.get_streak(), 0)
+        self.assertIsNone(self.journal.last_entry_date)
+
+    def test_calculate_streaks(self):
+        start = timezone.now().date() - timedelta(days=10)
+        entry_dates = [start + timedelta(days=day) for day in (0, 1, 2, 2, 5, 6)]
+        self.assertEqual(calculate_streaks(entry_dates), (2, 3, start + timedelta(days=6)))
+
+    def test_rebuildstreaks_command(self):
+        today = timezone.now().date()
+        for days_ago in (2, 1, 0):
+            entry = Entry.objects.create(journal=self.journal)
+            Entry.objects.filter(pk=entry.pk).update(date=today - timedelta(days=days_ago))
+        Journal.objects.filter(pk=self.journal.pk).update(current_streak=0, longest_streak=0, last_entry_date=None)
+
+        call_command('rebuildstreaks', stdout=StringIO())
+        self.journal.refresh_from_db()
+        self.assertEqual(self.journal.get_streak(), 3)
+        self.assertEqual(self.journal.longest_streak, 3)
+
+    def test_with_streaks_annotates_current_streak_for_each_journal(self):
+        other_journal = Journal.objects.create(name="Other Journal", owner=self.user)
+        stale_journal = Journal.objects.create(name="Stale Journal", owner=self.user)
+        self._create_entries(self.journal, days_ago=(6, 5, 3, 2, 1, 0))
+        self._create_entries(other_journal, days_ago=(4, 3, 2, 1))
+        self._create_entries(stale_journal, days_ago=(4, 3, 2))
+
+        with self.assertNumQueries(1):
+            streaks = {journal.name: journal.streak for journal in Journal.objects.with_streaks()}
+        self.assertEqual(streaks, {"John's Journal": 4, 'Other Journal': 4, 'Stale Journal': 0})
+
+    def test_with_streaks_matches_stored_streak(self):
+        self._create_entries(self.journal, days_ago=(0,))
+        journal = Journal.objects.with_streaks().get(pk=self.journal.pk)
+        self.assertEqual(journal.streak, journal.get_streak())
+
+    def test_day_numbers_are_consecutive_across_month_and_year_ends(self):
+        dates = [date(2023, 12, 31), date(2024, 1, 1), date(2024, 2, 28), date(2024, 2, 29), date(2024, 3, 1)]
+        for entry_date in dates:
+            entry = Entry.objects.create(journal=self.journal)
+            Entry.objects.filter(pk=entry.pk).update(date=entry_date)
+        day_numbers = dict(
+            self.journal.entries.filter(date__in=dates).annotate(day_number=DayNumber('date')).values_list('date', 'day_number')
+        )
+        self.assertEqual(
+            [day_numbers[entry_date] - day_numbers[dates[0]] for entry_date in dates],
+            [(entry_date - dates[0]).days for entry_date in dates],
+        )
+
+    def test_with_streaks_agrees_with_the_stored_streak_calculation(self):
+        patterns = {
+            'Unbroken': (0, 1, 2, 3),
+            'Broken yesterday': (1, 2, 4, 5, 6),
+            'Repeated days': (0, 0, 1, 1, 3),
+            'Across a year end': tuple(range(400, 0, -1)),
+            'Lapsed': (2, 3, 4),
+        }
+        for name, days_ago in patterns.items():
+            self._create_entries(Journal.objects.create(name=name, owner=self.user), days_ago)
+        for journal in Journal.objects.filter(name__in=patterns).with_streaks():
+            journal.recalculate_streaks()
+            self.assertEqual(journal.streak, journal.get_streak(), journal.name)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Set DATABASE_URL to a PostgreSQL database to run this test')
+    def test_with_streaks_runs_its_postgresql_query(self):
+        self.assertIn("DATE '1970-01-01'", str(Journal.objects.with_streaks().query))
+        self.test_with_streaks_annotates_current_streak_for_each_journal()
+
+    def test_with_streaks_without_entries(self):
+        journal = Journal.objects.with_streaks().get(pk=self.journal.pk)
+        self.assertEqual(journal.streak, 0)
+
     def tearDown(self):
         self.user.delete()
         self.journal.delete()
+
+    def _create_entries(self, journal, days_ago):
+        today = timezone.now().date()
+        for days in days_ago:
+            entry = Entry.objects.create(journal=journal)
+            Entry.objects.filter(pk=entry.pk).update(date=today - timedelta(days=days))
@@ -0,0 +1,132 @@
+"""Tests of the email outbox."""
+import smtplib
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from journals.models import OutboundEmail
+from journals.outbox import (TokenBucket, acquire_drain_lock, drain_outbox, enqueue_emails, get_outbox_depth,
+                             purge_sent_emails, release_drain_lock)
+
+
+@override_settings(OUTBOX_BATCH_SIZE=2, OUTBOX_BURST=100, OUTBOX_RATE_PER_SECOND=100,
+                   OUTBOX_MAX_ATTEMPTS=3, OUTBOX_BACKOFF_SECONDS=60, OUTBOX_BACKOFF_MAX_SECONDS=90)
+class OutboxTestCase(TestCase):
+    """Tests of the email outbox."""
+
+    def setUp(self):
+        enqueue_emails([('Hello', f'Message {i}', f'user{i}@example.org') for i in range(3)])
+
+    def test_drain_sends_every_due_message(self):
+        report = drain_outbox()
+        self.assertEqual((report['sent'], report['retried'], report['failed']), (3, 0, 0))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [f'user{i}@example.org' for i in range(3)])
+        self.assertEqual(report['depth'], {'due': 0, 'waiting': 0, 'failed': 0})
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.SENT).count(), 3)
+
+    def test_failure_does_not_stop_the_drain_and_is_retried_with_backoff(self):
+        first_message = OutboundEmail.objects.order_by('id').first()
+
+        def send_messages(backend, messages):
+            if messages[0].to == [first_message.to_email]:
+                raise smtplib.SMTPDataError(451, b'Mail server hiccup')
+            return len(messages)
+
+        with patch.object(EmailBackend, 'send_messages', autospec=True, side_effect=send_messages):
+            report = drain_outbox()
+        self.assertEqual((report['sent'], report['retried']), (2, 1))
+        self.assertEqual(report['depth'], {'due': 0, 'waiting': 1, 'failed': 0})
+
+        first_message.refresh_from_db()
+        self.assertEqual(first_message.attempts, 1)
+        self.assertIn('Mail server hiccup', first_message.last_error)
+        self.assertAlmostEqual(first_message.next_attempt_at, timezone.now() + timedelta(seconds=60), delta=timedelta(seconds=5))
+
+    def test_message_is_given_up_after_the_last_attempt(self):
+        OutboundEmail.objects.update(attempts=2)
+        with patch.object(EmailBackend, 'send_messages', side_effect=smtplib.SMTPRecipientsRefused({})):
+            report = drain_outbox()
+        self.assertEqual((report['sent'], report['failed']), (0, 3))
+        self.assertEqual(get_outbox_depth(), {'due': 0, 'waiting': 0, 'failed': 3})
+
+    def test_lost_connection_stops_the_drain_without_using_up_attempts(self):
+        first_message = OutboundEmail.objects.order_by('id').first()
+
+        def send_messages(backend, messages):
+            if messages[0].to != [first_message.to_email]:
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+            return len(messages)
+
+        with patch.object(EmailBackend, 'send_messages', autospec=True, side_effect=send_messages):
+            report = drain_outbox()
+        self.assertEqual((report['sent'], report['retried'], report['failed'], report['released']), (1, 0, 0, 1))
+        self.assertEqual(report['depth'], {'due': 2, 'waiting': 0, 'failed': 0})
+        self.assertEqual(list(OutboundEmail.objects.exclude(pk=first_message.pk).values_list('attempts', flat=True)), [0, 0])
+
+    def test_unreachable_mail_server_releases_the_batch(self):
+        with patch.object(EmailBackend, 'open', side_effect=ConnectionRefusedError('Connection refused')):
+            report = drain_outbox()
+        self.assertEqual((report['sent'], report['retried'], report['released']), (0, 0, 2))
+        self.assertEqual(get_outbox_depth(), {'due': 3, 'waiting': 0, 'failed': 0})
+        self.assertFalse(OutboundEmail.objects.filter(attempts__gt=0).exists())
+
+    def test_refused_login_releases_the_batch_instead_of_failing_the_queue(self):
+        OutboundEmail.objects.update(attempts=2)
+        with patch.object(EmailBackend, 'open', side_effect=smtplib.SMTPAuthenticationError(535, b'Bad credentials')):
+            report = drain_outbox()
+        self.assertEqual((report['failed'], report['released']), (0, 2))
+        self.assertEqual(get_outbox_depth(), {'due': 3, 'waiting': 0, 'failed': 0})
+        self.assertFalse(OutboundEmail.objects.filter(attempts__gt=2).exists())
+
+    def test_only_one_drain_runs_at_a_time(self):
+        holder = acquire_drain_lock()
+        self.assertIsNone(acquire_drain_lock())
+        report = drain_outbox()
+        self.assertTrue(report['skipped'])
+        self.assertEqual((report['sent'], report['depth']['due']), (0, 3))
+
+        release_drain_lock(holder)
+        report = drain_outbox()
+        self.assertFalse(report['skipped'])
+        self.assertEqual(report['sent'], 3)
+        self.assertIsNotNone(acquire_drain_lock())
+
+    def test_sent_messages_are_purged_after_their_retention(self):
+        drain_outbox()
+        OutboundEmail.objects.filter(pk=OutboundEmail.objects.order_by('id').first().pk).update(sent_at=timezone.now() - timedelta(days=2))
+        with self.settings(OUTBOX_SENT_RETENTION_SECONDS=24 * 60 * 60):
+            self.assertEqual(purge_sent_emails(), 1)
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_messages_waiting_for_a_retry_are_not_taken(self):
+        OutboundEmail.objects.update(next_attempt_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(drain_outbox()['sent'], 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_drain_can_stop_after_a_number_of_messages(self):
+        self.assertEqual(drain_outbox(max_messages=1)['sent'], 1)
+        self.assertEqual(get_outbox_depth()['due'], 2)
+
+    def test_token_bucket_waits_once_the_burst_is_used(self):
+        now = [0.0]
+        waits = []
+
+        def sleep(seconds):
+            waits.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+        for _ in range(4):
+            bucket.take()
+        self.assertEqual(waits, [0.5, 0.5])
+
+    def test_drain_command_sends_to_a_stand_in_smtp_server(self):
+        output = StringIO()
+        call_command('drainoutbox', stdout=output)
+        self.assertIn('accepted 3 and rejected 0', output.getvalue())
+        self.assertEqual(get_outbox_depth(), {'due': 0, 'waiting': 0, 'failed': 0})
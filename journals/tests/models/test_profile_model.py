@@ -0,0 +1,93 @@
+"""Unit tests for the Profile model."""
+from django.core.cache import cache
+from django.test import TestCase
+from journals.achievements import AchievementRegistry, achievement_registry
+from journals.models import ACHIEVEMENT_LEVELS, Profile, User, experience_to_reach_level, level_for_total_experience
+
+
+class ProfileModelTestCase(TestCase):
+    """Unit tests for the Profile model."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='@testuser',
+            first_name='Test',
+            last_name='User',
+            email='testuser@example.com',
+            password='Password123'
+        )
+        self.profile = self.user.profile
+
+    def test_level_for_total_experience_matches_levelling_one_level_at_a_time(self):
+        level, experience = 1, 0
+        for total_experience in range(0, 20000, 37):
+            while experience_to_reach_level(level + 1) <= total_experience:
+                level += 1
+            experience = total_experience - experience_to_reach_level(level)
+            self.assertEqual(level_for_total_experience(total_experience), (level, experience))
+
+    def test_add_experience_below_next_level(self):
+        self.profile.add_experience(30)
+        self._assert_profile_stored(level=1, experience=30)
+
+    def test_add_experience_levels_up(self):
+        self.profile.add_experience(60)
+        self._assert_profile_stored(level=2, experience=10)
+
+    def test_add_experience_levels_up_several_times(self):
+        self.profile.add_experience(50 + 100 + 150 + 20)
+        self._assert_profile_stored(level=4, experience=20)
+
+    def test_add_experience_without_level_up_is_one_update_and_one_read(self):
+        # The third query reads the leaderboard cache version
+        with self.assertNumQueries(3):
+            self.profile.add_experience(10)
+
+    def test_add_experience_does_not_lose_concurrent_experience(self):
+        stale_profile = Profile.objects.get(pk=self.profile.pk)
+        self.profile.add_experience(40)
+        stale_profile.add_experience(40)
+        stored_profile = Profile.objects.get(pk=self.profile.pk)
+        self.assertEqual((stored_profile.level, stored_profile.experience), (2, 30))
+        self.assertEqual((stale_profile.level, stale_profile.experience), (2, 30))
+
+    def test_level_up_assigns_crossed_achievements(self):
+        self.profile.add_experience(experience_to_reach_level(10))
+        self._assert_profile_stored(level=10, experience=0)
+        expected_names = {name for name, level in ACHIEVEMENT_LEVELS.items() if level <= 10}
+        self.assertEqual(set(self.profile.achievements.values_list('name', flat=True)), expected_names)
+        self.assertEqual(self.profile.top_achievement.name, 'Journal Enthusiast')
+
+    def test_achievements_are_not_assigned_twice(self):
+        self.profile.add_experience(experience_to_reach_level(5))
+        self.profile.add_experience(experience_to_reach_level(6) - experience_to_reach_level(5))
+        self.assertEqual(self.profile.achievements.count(), 2)
+
+    def _assert_profile_stored(self, level, experience):
+        stored_profile = Profile.objects.get(pk=self.profile.pk)
+        self.assertEqual((stored_profile.level, stored_profile.experience), (level, experience))
+        self.assertEqual((self.profile.level, self.profile.experience), (level, experience))
+
+    def test_level_up_costs_the_same_number_of_queries_at_any_level(self):
+        achievement_registry.get_achievements()
+        with self.assertNumQueries(7):
+            self.profile.add_experience(experience_to_reach_level(2))
+        with self.assertNumQueries(7):
+            self.profile.add_experience(experience_to_reach_level(100) - experience_to_reach_level(2))
+        self.assertEqual(self.profile.achievements.count(), len(ACHIEVEMENT_LEVELS))
+
+    def test_achievement_registry_is_refreshed_when_an_achievement_changes(self):
+        achievement = achievement_registry.get_achievements()[0]
+        achievement.description = 'Updated description'
+        achievement.save()
+        self.assertEqual(achievement_registry.get_achievements()[0].description, 'Updated description')
+
+    def test_achievement_change_in_another_process_reloads_the_registry(self):
+        other_process_registry = AchievementRegistry()
+        achievement_registry.get_achievements()
+        other_process_registry.get_achievements()
+        achievement = achievement_registry.get_achievements()[0]
+        achievement.description = 'Updated description'
+        achievement.save()
+        self.assertEqual(other_process_registry.get_achievements()[0].description, 'Updated description')
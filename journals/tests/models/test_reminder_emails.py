@@ -0,0 +1,109 @@
+"""Tests of the daily reminder emails."""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from journals.models import Entry, Journal, OutboundEmail, User, get_reminder_utc_hour
+from journals.reminders import get_users_to_remind, send_reminder_chunk
+from journals.tasks import send_reminder_emails
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, CELERY_TASK_EAGER_PROPAGATES=True,
+                   OUTBOX_BURST=100, OUTBOX_RATE_PER_SECOND=100, REMINDER_CHUNK_SIZE=2)
+class ReminderEmailsTestCase(TestCase):
+    """Tests of the daily reminder emails."""
+
+    fixtures = ['journals/tests/fixtures/default_user.json',
+                'journals/tests/fixtures/other_users.json']
+
+    def setUp(self):
+        for user in User.objects.all():
+            Journal.objects.create(name=f'Diary of {user.first_name}', owner=user)
+        written_journal = Journal.objects.get(owner__username='@janedoe')
+        Entry.objects.create(journal=written_journal, entry_name='Today')
+        self.user_without_journals = User.objects.create_user(username='@nojournals', email='nojournals@example.org', password='Password123')
+        self.today = timezone.localdate()
+
+    def test_reminds_users_without_an_entry_today(self):
+        result = send_reminder_emails(utc_hour=20)
+        self.assertEqual(result['chunks'], 2)
+        recipients = sorted(message.to[0] for message in mail.outbox)
+        self.assertEqual(recipients, ['johndoe@example.org', 'peterpickles@example.org', 'petrapickles@example.org'])
+        self.assertEqual(User.objects.filter(last_reminded_on=self.today).count(), 3)
+
+    def test_running_again_on_the_same_day_sends_nothing(self):
+        send_reminder_emails(utc_hour=20)
+        mail.outbox.clear()
+        self.assertEqual(send_reminder_emails(utc_hour=20)['chunks'], 0)
+
+        user_ids = User.objects.values_list('id', flat=True)
+        self.assertEqual(send_reminder_chunk(min(user_ids), max(user_ids) + 1, self.today), 0)
+        self.assertEqual(OutboundEmail.objects.count(), 3)
+
+    def test_chunk_queues_its_reminders_in_the_outbox(self):
+        user_ids = User.objects.values_list('id', flat=True)
+        self.assertEqual(send_reminder_chunk(min(user_ids), max(user_ids) + 1, self.today), 3)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.PENDING).count(), 3)
+
+    def test_only_users_whose_reminder_falls_in_the_hour_are_reminded(self):
+        user = User.objects.get(username='@johndoe')
+        user.time_zone = 'Asia/Tokyo'
+        user.reminder_hour = 9
+        user.save()
+        self.assertEqual(user.reminder_utc_hour, 0)
+
+        send_reminder_emails(utc_hour=0)
+        self.assertEqual([message.to[0] for message in mail.outbox], ['johndoe@example.org'])
+        send_reminder_emails(utc_hour=20)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_reminder_utc_hour_follows_daylight_saving_time(self):
+        self.assertEqual(get_reminder_utc_hour('Europe/London', 20, date(2024, 1, 15)), 20)
+        self.assertEqual(get_reminder_utc_hour('Europe/London', 20, date(2024, 7, 15)), 19)
+        self.assertEqual(get_reminder_utc_hour('America/New_York', 20, date(2024, 1, 15)), 1)
+
+    def test_stale_reminder_utc_hours_are_refreshed(self):
+        User.objects.filter(username='@johndoe').update(time_zone='Asia/Tokyo', reminder_hour=9)
+        send_reminder_emails(utc_hour=0)
+        self.assertEqual(User.objects.get(username='@johndoe').reminder_utc_hour, 0)
+        self.assertEqual([message.to[0] for message in mail.outbox], ['johndoe@example.org'])
+
+    def test_reminder_lists_the_journals_missing_an_entry_today(self):
+        user = User.objects.get(username='@johndoe')
+        Journal.objects.create(name='Gratitude', owner=user)
+        yesterday_entry = Entry.objects.create(journal=Journal.objects.get(name='Gratitude'))
+        Entry.objects.filter(pk=yesterday_entry.pk).update(date=self.today - timedelta(days=1))
+
+        send_reminder_emails(utc_hour=20)
+        message = next(message for message in mail.outbox if message.to == ['johndoe@example.org'])
+        self.assertIn('- Diary of John\n- Gratitude', message.body)
+
+    def test_users_to_remind_are_selected_in_one_query(self):
+        with self.assertNumQueries(1):
+            usernames = [user.username for user in get_users_to_remind(self.today)]
+        self.assertEqual(sorted(usernames), ['@johndoe', '@peterpickles', '@petrapickles'])
+
+    def test_users_west_of_utc_are_reminded_for_their_local_date(self):
+        evening_in_los_angeles = datetime(2024, 7, 16, 3, 0, tzinfo=dt_timezone.utc)  # 20:00 on 15 July there
+        wrote_in_the_morning = User.objects.get(username='@johndoe')
+        wrote_in_the_evening = User.objects.get(username='@peterpickles')
+        wrote_yesterday = User.objects.get(username='@petrapickles')
+        entry_dates = {wrote_in_the_morning: date(2024, 7, 15), wrote_in_the_evening: date(2024, 7, 16), wrote_yesterday: date(2024, 7, 14)}
+        for user, entry_date in entry_dates.items():
+            User.objects.filter(pk=user.pk).update(time_zone='America/Los_Angeles', reminder_hour=20)
+            entry = Entry.objects.create(journal=Journal.objects.get(owner=user))
+            Entry.objects.filter(pk=entry.pk).update(date=entry_date)
+
+        with mock.patch('django.utils.timezone.now', return_value=evening_in_los_angeles):
+            result = send_reminder_emails()
+        self.assertEqual(result['utc_hour'], 3)
+        self.assertEqual(list(OutboundEmail.objects.values_list('to_email', flat=True)), ['petrapickles@example.org'])
+        self.assertEqual(User.objects.get(pk=wrote_yesterday.pk).last_reminded_on, date(2024, 7, 15))
+
+    def test_users_who_wrote_today_are_not_reminded(self):
+        Entry.objects.create(journal=Journal.objects.get(owner__username='@johndoe'))
+        send_reminder_emails(utc_hour=20)
+        self.assertNotIn(['johndoe@example.org'], [message.to for message in mail.outbox])
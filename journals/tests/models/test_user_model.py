@@ -1,8 +1,14 @@
 """Unit tests for the User model."""
-from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from journals import recently_accessed
 from journals.models import Entry, Journal, User, profile_image_upload_path
+from journals.tasks import flush_recently_accessed_journals
 from unittest.mock import patch
+import tempfile
 import uuid
 from django.utils import timezone
 from datetime import timedelta
@@ -177,12 +183,111 @@ class UserModelTestCase(TestCase):
         self.assertEqual(after_result[2].name, "Third Journal")
         self.assertEqual(after_result[3].name, "Second Journal")
     
+    def test_recently_accessed_journals_skip_and_prune_deleted_journals(self):
+        for name in ['Default Journal', 'Second Journal', 'Third Journal']:
+            self.user.add_to_journals_recently_accessed(Journal.objects.get(name=name))
+        Journal.objects.get(name='Second Journal').delete()
+
+        journals = self.user.get_recently_accessed_journals()
+        self.assertEqual([journal.name for journal in journals], ['Third Journal', 'Default Journal'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.recently_accessed_journals, [journal.id for journal in journals])
+
+    def test_recently_accessed_journals_are_fetched_in_one_query(self):
+        for name in ['Default Journal', 'Second Journal', 'Third Journal', 'Fourth Journal']:
+            self.user.add_to_journals_recently_accessed(Journal.objects.get(name=name))
+        with self.assertNumQueries(1):
+            journals = self.user.get_recently_accessed_journals()
+        self.assertEqual(journals[0].name, 'Fourth Journal')
+        self.assertEqual(journals[-1].entry_count, 2)
+
+    def test_adding_journal_already_first_does_not_write(self):
+        journal = Journal.objects.get(name='Default Journal')
+        self.user.add_to_journals_recently_accessed(journal)
+        with self.assertNumQueries(0):
+            self.user.add_to_journals_recently_accessed(journal)
+
+    def test_adding_journal_only_writes_recently_accessed_journals(self):
+        journal = Journal.objects.get(name='Default Journal')
+        with CaptureQueriesContext(connection) as context:
+            self.user.add_to_journals_recently_accessed(journal)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIn('recently_accessed_journals', context.captured_queries[0]['sql'])
+        self.assertNotIn('password', context.captured_queries[0]['sql'])
+
+    def test_concurrent_additions_do_not_overwrite_each_other(self):
+        other_request_user = User.objects.get(pk=self.user.pk)
+        first_journal = Journal.objects.get(name='Default Journal')
+        second_journal = Journal.objects.get(name='Second Journal')
+        self.user.add_to_journals_recently_accessed(first_journal)
+        other_request_user.add_to_journals_recently_accessed(second_journal)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.recently_accessed_journals, [second_journal.id, first_journal.id])
+
+    def test_buffered_additions_are_written_when_flushed(self):
+        self._use_shared_cache(RECENTLY_ACCESSED_JOURNALS_BUFFERED=True)
+        journal = Journal.objects.get(name='Default Journal')
+        with self.assertNumQueries(0):
+            self.user.add_to_journals_recently_accessed(journal)
+        self.assertEqual(self.user.get_recently_accessed_journals(), [journal])
+        self.assertEqual(User.objects.get(pk=self.user.pk).recently_accessed_journals, [])
+
+        self.assertEqual(flush_recently_accessed_journals(), 1)
+        self.assertEqual(User.objects.get(pk=self.user.pk).recently_accessed_journals, [journal.id])
+
+    @override_settings(RECENTLY_ACCESSED_JOURNALS_BUFFERED=True)
+    def test_buffering_is_refused_with_a_per_process_cache(self):
+        journal = Journal.objects.get(name='Default Journal')
+        with self.assertRaises(ImproperlyConfigured):
+            self.user.add_to_journals_recently_accessed(journal)
+
+    def test_locked_buffer_falls_back_to_the_database(self):
+        self._use_shared_cache(RECENTLY_ACCESSED_JOURNALS_BUFFERED=True)
+        journal = Journal.objects.get(name='Default Journal')
+        cache.set(f'{recently_accessed._get_buffer_key(self.user.pk)}:lock', 'other holder', 60)
+        with patch.object(recently_accessed, 'LOCK_WAIT', 0.05):
+            self.user.add_to_journals_recently_accessed(journal)
+        self.assertEqual(User.objects.get(pk=self.user.pk).recently_accessed_journals, [journal.id])
+
+    def test_expired_lock_holder_does_not_release_the_next_holders_lock(self):
+        self._use_shared_cache()
+        with recently_accessed._cache_lock('key'):
+            cache.set('key:lock', 'next holder', 60)
+        self.assertEqual(cache.get('key:lock'), 'next holder')
+
+    def _use_shared_cache(self, **other_settings):
+        """Switch to a file based cache, which unlike the default in-memory one is shared between processes"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name}
+        }, **other_settings)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
     def test_get_journals_without_today_entry(self):
         journal_without_entry = self.user.get_journals_without_today_entry()
         #Should return all journals since none of them have any entries
         expected_result = Journal.objects.filter(owner=self.user)
         self.assertEqual(list(journal_without_entry), list(expected_result))
     
+    def test_get_journals_without_today_entry_excludes_journals_with_entry_today(self):
+        journal = Journal.objects.get(name='Default Journal')
+        Entry.objects.create(journal=journal)
+        with self.assertNumQueries(1):
+            journals_without_entry = list(self.user.get_journals_without_today_entry())
+        self.assertNotIn(journal, journals_without_entry)
+        self.assertEqual(len(journals_without_entry), Journal.objects.filter(owner=self.user).count() - 1)
+
+    def test_get_journals_grouped_by_today_entry(self):
+        journal = Journal.objects.get(name='Default Journal')
+        Entry.objects.create(journal=journal)
+        with self.assertNumQueries(1):
+            journals_with_entry, journals_without_entry = self.user.get_journals_grouped_by_today_entry()
+        self.assertEqual(journals_with_entry, [journal])
+        self.assertEqual(journals_without_entry, list(self.user.get_journals_without_today_entry()))
+
     def test_get_user_today_entries(self):
         journal_without_entry = self.user.get_user_today_entries()
         #Should return no entries
@@ -0,0 +1,111 @@
+"""Tests of the download everything archive view."""
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from journals.archive import delete_expired_archives
+from journals.models import Entry, Journal, Template, User
+
+
+class DownloadArchiveViewTestCase(TestCase):
+    """Tests of the download everything archive view."""
+
+    fixtures = ['journals/tests/fixtures/default_user.json',
+                'journals/tests/fixtures/default_template_owner.json']
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=directory, ARCHIVE_EXPORT_DIR=f'{directory}/archives')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.archive_directory = f'{directory}/archives'
+
+        self.user = User.objects.get(username='@johndoe')
+        template = Template.objects.create(name='Archive Template', owner=self.user, questions=['How was today?'])
+        self.journal = Journal.objects.create(name='Travel Log', owner=self.user, template=template)
+        self.entry = Entry.objects.create(journal=self.journal, entry_name='Lisbon', responses=['Sunny'], mood='Happy')
+        self.entry.multimedia_file.save('ticket.txt', ContentFile(b'train ticket'))
+
+        other_user = User.objects.create_user(username='@other', email='other@example.com', password='Password123')
+        other_journal = Journal.objects.create(name='Secret', owner=other_user, template=template)
+        Entry.objects.create(journal=other_journal, entry_name='Private', responses=['Hidden'])
+
+        self.url = reverse('download_archive')
+        self.client.login(username=self.user.username, password="Password123")
+
+    def test_download_archive_url(self):
+        self.assertEqual(self.url, '/profile/archive/')
+
+    def test_archive_holds_the_users_entries_and_attachments(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            names = archive.namelist()
+            entry_path = f'journals/{self.journal.id}_travel-log/entries/{self.entry.date.isoformat()}_{self.entry.id}'
+            entry_data = json.loads(archive.read(f'{entry_path}.json'))
+            self.assertEqual(entry_data['responses'], [{'question': 'How was today?', 'response': 'Sunny'}])
+            self.assertIn('## How was today?\n\nSunny', archive.read(f'{entry_path}.md').decode())
+            attachment_name = next(name for name in names if name.startswith(entry_path) and name.endswith('.txt'))
+            self.assertEqual(archive.read(attachment_name), b'train ticket')
+        self.assertFalse(any('Secret' in name or 'secret' in name for name in names))
+
+    def test_finished_archive_is_served_with_range_support(self):
+        streamed = b''.join(self.client.get(self.url).streaming_content)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), streamed)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=response['ETag'])
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-{len(streamed) - 1}/{len(streamed)}')
+        self.assertEqual(b''.join(response.streaming_content), streamed[10:])
+
+    def test_unsatisfiable_range_is_rejected(self):
+        streamed = b''.join(self.client.get(self.url).streaming_content)
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(streamed)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(streamed)}')
+
+    def test_changed_archive_ignores_a_stale_range(self):
+        b''.join(self.client.get(self.url).streaming_content)
+        etag = self.client.get(self.url)['ETag']
+        Entry.objects.create(journal=self.journal, entry_name='Porto', responses=['Rainy'])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertTrue(any(name.endswith('.md') and b'Porto' in archive.read(name) for name in archive.namelist()))
+
+    def test_expired_and_abandoned_archives_are_deleted(self):
+        b''.join(self.client.get(self.url).streaming_content)
+        [saved_name] = os.listdir(self.archive_directory)
+        saved_path = os.path.join(self.archive_directory, saved_name)
+        abandoned_path = os.path.join(self.archive_directory, 'abandoned.tmp')
+        in_progress_path = os.path.join(self.archive_directory, 'in_progress.tmp')
+        for path in (abandoned_path, in_progress_path):
+            with open(path, 'wb') as partial_archive:
+                partial_archive.write(b'partial')
+        two_hours_ago = os.path.getmtime(saved_path) - 2 * 60 * 60
+        os.utime(abandoned_path, (two_hours_ago, two_hours_ago))
+
+        with self.settings(ARCHIVE_EXPORT_MAX_AGE=24 * 60 * 60, ARCHIVE_EXPORT_STALE_AFTER=60 * 60):
+            self.assertEqual(delete_expired_archives(), 1)
+            self.assertEqual(sorted(os.listdir(self.archive_directory)), ['in_progress.tmp', saved_name])
+
+            two_days_ago = os.path.getmtime(saved_path) - 48 * 60 * 60
+            os.utime(saved_path, (two_days_ago, two_days_ago))
+            self.client.get(self.url)
+            self.assertEqual(delete_expired_archives(now=os.path.getmtime(saved_path) + 2 * 60 * 60), 1)
+            self.assertEqual(os.listdir(self.archive_directory), [saved_name])
+            self.assertEqual(delete_expired_archives(now=os.path.getmtime(saved_path) + 48 * 60 * 60), 1)
+        self.assertEqual(os.listdir(self.archive_directory), [])
@@ -1,6 +1,9 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
 from django.test import TestCase
 from django.urls import reverse
-from journals.models import User
+from journals.leaderboard import TOP_PROFILES_CACHE_KEY, get_top_profiles
+from journals.models import CacheVersion, Profile, User
 from django.conf import settings
 
 class DashboardViewTestCase(TestCase):
@@ -20,6 +23,7 @@ class DashboardViewTestCase(TestCase):
         cls.url = reverse('dashboard')
 
     def setUp(self):
+        cache.clear()
         self.client.login(username=self.user.username, password=self.password)
 
 
@@ -57,4 +61,54 @@ class DashboardViewTestCase(TestCase):
         response = self.client.get(self.url)
         self.assertIn('current_user_rank', response.context)
         self.assertContains(response, 'user11')  
-        self.assertContains(response, response.context['current_user_rank'])  
\ No newline at end of file
+        self.assertContains(response, response.context['current_user_rank'])
+
+    def test_user_rank_counts_profiles_ahead(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['current_user_rank'], 12)
+
+    def test_leaderboard_is_cached_between_requests(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            get_top_profiles()
+
+    def test_add_experience_outside_top_10_keeps_cached_leaderboard(self):
+        get_top_profiles()
+        self.user.profile.add_experience(10)
+        with self.assertNumQueries(1):
+            get_top_profiles()
+
+    def test_invalidation_by_another_process_is_seen(self):
+        get_top_profiles()
+        Profile.objects.filter(user=self.user).update(level=100)
+        # Another process only bumps the version in the database, this process's cache keeps the old list
+        CacheVersion.bump(TOP_PROFILES_CACHE_KEY)
+        self.assertEqual(get_top_profiles()[0].user, self.user)
+
+    def test_add_experience_into_top_10_invalidates_cached_leaderboard(self):
+        get_top_profiles()
+        self.user.profile.add_experience(5000)
+        top_users = get_top_profiles()
+        self.assertIn(self.user.profile, top_users)
+
+    def test_leaderboard_renders_without_extra_queries(self):
+        User.objects.get(username='user0').profile.add_experience(5000)
+        self.user.profile.add_experience(50)
+        top_users = get_top_profiles()
+        profile = Profile.objects.select_related('top_achievement').get(user=self.user)
+        self.assertIsNotNone(top_users[0].highest_achievement())
+        with self.assertNumQueries(0):
+            render_to_string('partials/leaderboard.html', {
+                'top_users': top_users,
+                'in_top_users': False,
+                'current_user_rank': 12,
+                'profile': profile,
+                'user': self.user,
+            })
+
+    def test_highest_achievement_is_kept_on_profile(self):
+        profile = self.user.profile
+        profile.add_experience(profile.required_experience_for_next_level())
+        profile.refresh_from_db()
+        self.assertEqual(profile.top_achievement.name, 'Getting Started')
+        self.assertEqual(profile.highest_achievement(), profile.achievements.order_by('-level').first())
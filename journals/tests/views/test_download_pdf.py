@@ -2,11 +2,13 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
 from journals.models import Journal, Entry, Response, Template
+from journals.tests.helpers import use_temporary_directory
 
 class DownloadJournalPDFTestCase(TestCase):
     """Tests the download journal PDF view."""
 
     def setUp(self):
+        use_temporary_directory(self, 'ENTRY_PDF_CACHE_DIR')
         self.user = get_user_model().objects.create_user(
             username='testuser',
             email='test@example.com',
@@ -27,7 +29,7 @@ class DownloadJournalPDFTestCase(TestCase):
         self.client.login(username='testuser', password='testpassword')
         url = reverse('download_journal_pdf', kwargs={'journal_id': self.journal.id})
         response = self.client.get(url)
-        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.status_code, 302)
 
     def test_download_entry_pdf(self):
         self.client.login(username='testuser', password='testpassword')
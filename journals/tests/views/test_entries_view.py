@@ -0,0 +1,110 @@
+"""Tests of the journal entries view."""
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from journals.models import Entry, Journal, Template, User
+from journals.search import SEARCH_TABLE
+
+
+@override_settings(ENTRIES_PAGE_SIZE=2)
+class EntriesViewTestCase(TestCase):
+    """Tests of the journal entries view."""
+
+    fixtures = ['journals/tests/fixtures/default_user.json',
+                'journals/tests/fixtures/default_template_owner.json']
+
+    def setUp(self):
+        self.user = User.objects.get(username='@johndoe')
+        template = Template.objects.get(name='Base Template')
+        self.journal = Journal.objects.create(name='Paged Journal', owner=self.user, template=template)
+        self.entries = [
+            Entry.objects.create(journal=self.journal, entry_name=f'Entry {i}') for i in range(5)
+        ]
+        # Two entries share a date so the id breaks the tie.
+        for i, entry in enumerate(self.entries):
+            Entry.objects.filter(pk=entry.pk).update(date=date.today() - timedelta(days=i // 2))
+        self.url = reverse('view_journal_entries', args=[self.journal.id])
+        self.client.login(username=self.user.username, password="Password123")
+
+    def test_get_walks_every_entry_once_newest_first(self):
+        seen_ids = self._walk_pages(lambda cursor: self.client.get(self.url, {'after': cursor} if cursor else {}))
+        self.assertEqual(seen_ids, [entry.id for entry in self._newest_first(self.entries)])
+
+    def test_get_shows_total_entry_count(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context['entry_list']), 2)
+        self.assertEqual(response.context['entry_count'], 5)
+        self.assertContains(response, 'Next page')
+
+    def test_search_is_paginated(self):
+        self.entries[0].entry_name = 'Something else'
+        self.entries[0].save()
+
+        def search(cursor):
+            data = {'search_name': 'Entry'}
+            if cursor:
+                data['after'] = cursor
+            return self.client.post(self.url, data)
+
+        seen_ids = self._walk_pages(search)
+        self.assertEqual(len(seen_ids), len(set(seen_ids)))
+        self.assertEqual(set(seen_ids), {entry.id for entry in self.entries[1:]})
+
+    def test_search_cursor_holds_an_integer_rank(self):
+        response = self.client.post(self.url, {'search_name': 'Entry'})
+        self.assertRegex(response.context['next_cursor'], r'^-?\d+_\d+$')
+
+    def test_search_matches_responses_and_highlights_them(self):
+        Entry.objects.create(journal=self.journal, entry_name='Walk', responses=['I watched the sunset by the lake'])
+        response = self.client.post(self.url, {'search_name': 'sunset'})
+        self.assertEqual([entry.entry_name for entry in response.context['entry_list']], ['Walk'])
+        self.assertEqual(response.context['entry_count'], 1)
+        self.assertContains(response, '<mark>sunset</mark>', html=False)
+
+    def test_search_ranks_name_matches_first(self):
+        in_responses = Entry.objects.create(journal=self.journal, entry_name='Monday', responses=['Went hiking'])
+        in_name = Entry.objects.create(journal=self.journal, entry_name='Hiking', responses=['Long day'])
+        response = self.client.post(self.url, {'search_name': 'hiking'})
+        self.assertEqual(list(response.context['entry_list']), [in_name, in_responses])
+
+    def test_search_escapes_entry_text(self):
+        Entry.objects.create(journal=self.journal, entry_name='Script', responses=['<script>alert(1)</script> note'])
+        response = self.client.post(self.url, {'search_name': 'note'})
+        self.assertNotContains(response, '<script>alert(1)</script>', html=False)
+
+    def test_search_index_follows_edits_and_deletes(self):
+        entry = self.entries[0]
+        entry.entry_name = 'Renamed'
+        entry.save()
+        self.assertEqual(self.client.post(self.url, {'search_name': 'renamed'}).context['entry_count'], 1)
+        entry.delete()
+        self.assertEqual(self.client.post(self.url, {'search_name': 'renamed'}).context['entry_count'], 0)
+
+    def test_rebuildsearchindex_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        call_command('rebuildsearchindex', '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(self.client.post(self.url, {'search_name': 'entry'}).context['entry_count'], 5)
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(self.url, {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['entry_list']), 2)
+
+    def _walk_pages(self, fetch_page):
+        seen_ids, cursor = [], None
+        while True:
+            response = fetch_page(cursor)
+            self.assertEqual(response.status_code, 200)
+            seen_ids += [entry.id for entry in response.context['entry_list']]
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                return seen_ids
+
+    def _newest_first(self, entries):
+        return sorted(Entry.objects.filter(pk__in=[entry.pk for entry in entries]),
+                      key=lambda entry: (entry.date, entry.id), reverse=True)
@@ -0,0 +1,63 @@
+"""Tests of the cached entry PDF download."""
+import os
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from journals import pdf_cache
+from journals.models import Entry, Journal, Template, User
+from journals.tasks import evict_entry_pdf_cache
+from journals.tests.helpers import use_temporary_directory
+
+
+class EntryPDFCacheTestCase(TestCase):
+    """Tests of the cached entry PDF download."""
+
+    fixtures = ['journals/tests/fixtures/default_user.json',
+                'journals/tests/fixtures/default_template_owner.json']
+
+    def setUp(self):
+        use_temporary_directory(self, 'ENTRY_PDF_CACHE_DIR')
+        self.user = User.objects.get(username='@johndoe')
+        template = Template.objects.create(name='PDF Template', owner=self.user, questions=['How was today?'])
+        self.journal = Journal.objects.create(name='PDF Journal', owner=self.user, template=template)
+        self.entry = Entry.objects.create(journal=self.journal, entry_name='Cached entry', responses=['Fine'])
+        self.url = reverse('download_entry_pdf', args=[self.journal.id, self.entry.id])
+        self.client.login(username=self.user.username, password="Password123")
+
+    def test_unchanged_entry_is_rendered_once(self):
+        with mock.patch.object(pdf_cache, 'render_entry_pdf', wraps=pdf_cache.render_entry_pdf) as render:
+            first_response = self.client.get(self.url)
+            second_response = self.client.get(self.url)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first_response['ETag'], second_response['ETag'])
+        self.assertTrue(b''.join(second_response.streaming_content).startswith(b'%PDF'))
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed_entry_gets_a_new_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.entry.responses = ['Better']
+        self.entry.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_least_recently_used_files_are_evicted(self):
+        first_path = pdf_cache.get_entry_pdf_path(self.entry, ['How was today?'])
+        self.entry.entry_name = 'Renamed entry'
+        second_path = pdf_cache.get_entry_pdf_path(self.entry, ['How was today?'])
+        os.utime(first_path, (0, 0))
+        with override_settings(ENTRY_PDF_CACHE_MAX_BYTES=os.path.getsize(second_path)):
+            self.assertEqual(evict_entry_pdf_cache(), 1)
+        self.assertFalse(os.path.exists(first_path))
+        self.assertTrue(os.path.exists(second_path))
+
+    def test_rendering_does_not_scan_the_cache(self):
+        with mock.patch.object(pdf_cache.os, 'scandir', wraps=os.scandir) as scandir:
+            with override_settings(ENTRY_PDF_CACHE_MAX_BYTES=1):
+                pdf_cache.get_entry_pdf_path(self.entry, ['How was today?'])
+            scandir.assert_not_called()
@@ -0,0 +1,133 @@
+"""Tests of the background journal PDF export."""
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from django.urls import reverse
+from journals.exports import get_or_start_journal_export, run_journal_export
+from journals.images import PDF_IMAGE_MAX_SIZE, get_pdf_image_name, get_pdf_image_path
+from journals.models import Entry, Journal, JournalExport, Template, User
+from journals.tests.helpers import use_temporary_class_directory
+from PIL import Image
+
+
+class JournalExportViewTestCase(TestCase):
+    """Tests of the background journal PDF export."""
+
+    fixtures = ['journals/tests/fixtures/default_user.json',
+                'journals/tests/fixtures/default_template_owner.json']
+
+    @classmethod
+    def setUpClass(cls):
+        use_temporary_class_directory(cls, 'MEDIA_ROOT')
+        super().setUpClass()
+
+    def setUp(self):
+        self.user = User.objects.get(username='@johndoe')
+        self.template = Template.objects.create(name='Export Template', owner=self.user, questions=['How was today?'])
+        self.journal = Journal.objects.create(name='Export Journal', owner=self.user, template=self.template)
+        for i in range(3):
+            Entry.objects.create(journal=self.journal, entry_name=f'Entry {i}', responses=[f'Answer {i}'])
+        self.download_url = reverse('download_journal_pdf', args=[self.journal.id])
+        self.client.login(username=self.user.username, password="Password123")
+
+    def test_export_writes_the_pdf_and_records_progress(self):
+        export = self._start_export()
+        run_journal_export(export.pk)
+        export.refresh_from_db()
+        self.assertEqual((export.status, export.progress), (JournalExport.DONE, 100))
+        with export.file.open('rb') as exported_file:
+            self.assertTrue(exported_file.read(5).startswith(b'%PDF'))
+
+    def test_status_page_links_to_the_finished_file(self):
+        export = self._start_export()
+        response = self.client.get(reverse('journal_export', args=[self.journal.id, export.id]))
+        self.assertContains(response, '0%')
+
+        run_journal_export(export.pk)
+        response = self.client.get(reverse('journal_export', args=[self.journal.id, export.id]))
+        download_export_url = reverse('download_journal_export', args=[self.journal.id, export.id])
+        self.assertContains(response, download_export_url)
+        response = self.client.get(download_export_url)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_unchanged_journal_reuses_the_last_export(self):
+        export = self._start_export()
+        self.assertEqual(self._start_export(), export)
+        run_journal_export(export.pk)
+
+        response = self.client.get(self.download_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(JournalExport.objects.count(), 1)
+
+    def test_changed_entry_starts_a_new_export_and_drops_the_old_file(self):
+        export = self._start_export()
+        run_journal_export(export.pk)
+        entry = self.journal.entries.first()
+        entry.responses = ['Changed answer']
+        entry.save()
+
+        new_export = self._start_export()
+        self.assertNotEqual(new_export, export)
+        run_journal_export(new_export.pk)
+        self.assertEqual(list(JournalExport.objects.all()), [new_export])
+
+    def test_image_attachments_are_embedded_downscaled(self):
+        entry = self.journal.entries.first()
+        photo = BytesIO()
+        Image.new('RGB', (3000, 2000), 'teal').save(photo, 'PNG')
+        entry.multimedia_file.save('photo.png', ContentFile(photo.getvalue()))
+        other_entry = self.journal.entries.exclude(pk=entry.pk).first()
+        other_entry.multimedia_file.save('notes.pdf', ContentFile(b'not an image'))
+
+        export = self._start_export()
+        run_journal_export(export.pk)
+        export.refresh_from_db()
+        self.assertEqual(export.status, JournalExport.DONE)
+
+        storage = entry.multimedia_file.storage
+        with storage.open(get_pdf_image_name(entry.multimedia_file.name)) as derivative:
+            self.assertLessEqual(max(Image.open(derivative).size), max(PDF_IMAGE_MAX_SIZE))
+        self.assertFalse(storage.exists(get_pdf_image_name(other_entry.multimedia_file.name)))
+
+    def test_attachments_differing_only_by_extension_get_their_own_image(self):
+        entry, other_entry = self.journal.entries.all()[:2]
+        for attachment_entry, image_format, colour in ((entry, 'PNG', 'red'), (other_entry, 'JPEG', 'blue')):
+            image = BytesIO()
+            Image.new('RGB', (50, 50), colour).save(image, image_format)
+            attachment_entry.multimedia_file.save(f'same_name.{image_format.lower()}', ContentFile(image.getvalue()))
+
+        image_paths = [get_pdf_image_path(entry.multimedia_file), get_pdf_image_path(other_entry.multimedia_file)]
+        self.assertNotEqual(image_paths[0], image_paths[1])
+        colours = [Image.open(path).getpixel((25, 25)) for path in image_paths]
+        self.assertGreater(colours[0][0], colours[0][2])
+        self.assertGreater(colours[1][2], colours[1][0])
+
+    def test_replacing_or_removing_an_attachment_deletes_its_image(self):
+        entry = self.journal.entries.first()
+        image = BytesIO()
+        Image.new('RGB', (50, 50), 'teal').save(image, 'PNG')
+        entry.multimedia_file.save('before.png', ContentFile(image.getvalue()))
+        storage = entry.multimedia_file.storage
+        first_image_name = get_pdf_image_name(entry.multimedia_file.name)
+        get_pdf_image_path(entry.multimedia_file)
+
+        entry = Entry.objects.get(pk=entry.pk)
+        entry.multimedia_file.save('after.png', ContentFile(image.getvalue()))
+        self.assertFalse(storage.exists(first_image_name))
+
+        second_image_name = get_pdf_image_name(entry.multimedia_file.name)
+        get_pdf_image_path(entry.multimedia_file)
+        entry.delete()
+        self.assertFalse(storage.exists(second_image_name))
+
+    def test_other_users_cannot_see_the_export(self):
+        export = self._start_export()
+        User.objects.create_user(username='@other', email='other@example.com', password='Password123')
+        self.client.login(username='@other', password='Password123')
+        response = self.client.get(reverse('journal_export', args=[self.journal.id, export.id]))
+        self.assertRedirects(response, reverse('journals_home'), fetch_redirect_response=False)
+
+    def _start_export(self):
+        journal = Journal.objects.select_related('template').get(pk=self.journal.pk)
+        return get_or_start_journal_export(journal, self.user)
@@ -0,0 +1,49 @@
+"""Tests of the journals view."""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from journals.models import Entry, Journal, Template, User
+
+
+class JournalsViewTestCase(TestCase):
+    """Tests of the journals view."""
+
+    fixtures = ['journals/tests/fixtures/default_user.json',
+                'journals/tests/fixtures/default_template_owner.json']
+
+    def setUp(self):
+        self.user = User.objects.get(username='@johndoe')
+        self.template = Template.objects.get(name='Base Template')
+        self.url = reverse('journals_home')
+        self.client.login(username=self.user.username, password="Password123")
+
+    def test_journals_url(self):
+        self.assertEqual(self.url, '/journals/')
+
+    def test_journal_cards_show_card_stats(self):
+        journal = self._create_journal_with_entry('Card Journal')
+        response = self.client.get(self.url)
+        card_journal = response.context['journal_list'].get(pk=journal.pk)
+        self.assertEqual(card_journal.entry_count, 1)
+        self.assertTrue(card_journal.has_today_entry)
+        self.assertEqual(card_journal.streak, 1)
+        self.assertContains(response, 'Number of entries created: 1')
+
+    def test_number_of_queries_does_not_grow_with_journal_count(self):
+        self._create_journal_with_entry('First Journal')
+        query_count_with_one_journal = self._count_queries()
+        for i in range(5):
+            self._create_journal_with_entry(f'Journal {i}')
+        self.assertEqual(self._count_queries(), query_count_with_one_journal)
+
+    def _create_journal_with_entry(self, name):
+        journal = Journal.objects.create(name=name, owner=self.user, template=self.template)
+        Entry.objects.create(journal=journal, entry_name=f'{name} entry')
+        return journal
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
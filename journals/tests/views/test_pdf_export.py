@@ -1,14 +1,21 @@
 from django.test import TestCase, Client
 from django.urls import reverse
-from journals.models import User, Journal, Entry, Template
+from journals.exports import run_journal_export
+from journals.models import User, Journal, JournalExport, Entry, Template
 from io import BytesIO
 from django.core.files.base import ContentFile
 from django.utils.dateparse import parse_date
+from journals.tests.helpers import use_temporary_class_directory, use_temporary_directory
 
 class PDFExportTest(TestCase):
 
+    @classmethod
+    def setUpClass(cls):
+        use_temporary_class_directory(cls, 'MEDIA_ROOT')
+        super().setUpClass()
 
     def setUp(self):
+        use_temporary_directory(self, 'ENTRY_PDF_CACHE_DIR')
         self.client = Client()
         self.user = User.objects.create_user(username='@testuser', password='testpassword', email='test@test.com')
         self.another_user, _ = User.objects.get_or_create(username='@anotheruser', defaults={'password': 'password123', 'email': 'another@example.com'})
@@ -44,11 +51,27 @@ class PDFExportTest(TestCase):
     def test_journal_pdf_export(self):
         download_url = reverse('download_journal_pdf', args=[self.journal.pk])
         
+        response = self.client.get(download_url)
+        export = JournalExport.objects.get(journal=self.journal)
+        self.assertRedirects(response, reverse('journal_export', args=[self.journal.pk, export.pk]))
+
+        run_journal_export(export.pk)
         response = self.client.get(download_url)
         
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/pdf')
 
+    def test_entry_with_long_answers_and_markup_exports(self):
+        self.entry.entry_name = 'Fish & <chips>'
+        self.entry.responses = ['word ' * 20000, 'a < b\nsecond line']
+        self.entry.save()
+        download_url = reverse('download_entry_pdf', args=[self.journal.pk, self.entry.pk])
+
+        response = self.client.get(download_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
     def test_pdf_export_permission(self):
         self.client.logout()
         
@@ -79,4 +102,5 @@ class PDFExportTest(TestCase):
         journal_response = self.client.get(journal_download_url)
 
         self.assertEqual(entry_response.status_code, 200)
-        self.assertEqual(journal_response.status_code, 200)
+        self.assertEqual(journal_response.status_code, 302)
+        self.assertTrue(journal_response.url.startswith(f'/journals/{self.journal.pk}/exports/'))
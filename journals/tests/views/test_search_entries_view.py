@@ -0,0 +1,100 @@
+"""Tests of the cross-journal entry search view."""
+from datetime import date
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from journals.models import Entry, Journal, Template, User
+
+
+@override_settings(ENTRIES_PAGE_SIZE=2)
+class SearchEntriesViewTestCase(TestCase):
+    """Tests of the cross-journal entry search view."""
+
+    fixtures = ['journals/tests/fixtures/default_user.json',
+                'journals/tests/fixtures/default_template_owner.json']
+
+    def setUp(self):
+        self.user = User.objects.get(username='@johndoe')
+        template = Template.objects.get(name='Base Template')
+        self.travel = Journal.objects.create(name='Travel', owner=self.user, template=template)
+        self.work = Journal.objects.create(name='Work', owner=self.user, template=template)
+        self._create_entry(self.travel, 'Beach day', ['Swam in the sea'], 'happy', date(2024, 1, 5))
+        self._create_entry(self.travel, 'Mountains', ['Hiked to the lake'], 'happy', date(2024, 2, 10))
+        self._create_entry(self.work, 'Deadline', ['Finished the lake report'], 'sad', date(2024, 2, 12))
+
+        other_user = User.objects.create_user(username='@other', email='other@example.com', password='Password123')
+        other_journal = Journal.objects.create(name='Other', owner=other_user, template=template)
+        self._create_entry(other_journal, 'Lake trip', ['Lake lake lake'], 'happy', date(2024, 2, 1))
+
+        self.url = reverse('search_entries')
+        self.client.login(username=self.user.username, password="Password123")
+
+    def test_search_url(self):
+        self.assertEqual(self.url, '/journals/search/')
+
+    def test_search_covers_every_journal_of_the_user_only(self):
+        response = self.client.get(self.url, {'q': 'lake'})
+        self.assertEqual({entry.entry_name for entry in response.context['entry_list']}, {'Mountains', 'Deadline'})
+
+    def test_filters_by_mood_and_date_range(self):
+        response = self.client.get(self.url, {'q': 'lake', 'mood': 'sad'})
+        self.assertEqual([entry.entry_name for entry in response.context['entry_list']], ['Deadline'])
+        response = self.client.get(self.url, {'start_date': '2024-01-01', 'end_date': '2024-01-31'})
+        self.assertEqual([entry.entry_name for entry in response.context['entry_list']], ['Beach day'])
+
+    def test_reversed_date_range_is_invalid(self):
+        response = self.client.get(self.url, {'start_date': '2024-02-01', 'end_date': '2024-01-01'})
+        self.assertTrue(response.context['form'].errors)
+        self.assertEqual(response.context['entry_list'], [])
+
+    def test_facets_count_the_matching_entries(self):
+        response = self.client.get(self.url)
+        facets = response.context['facets']
+        self.assertEqual([(facet['label'], facet['count']) for facet in facets['journals']], [('Travel', 2), ('Work', 1)])
+        self.assertEqual([(facet['value'], facet['count']) for facet in facets['moods']], [('happy', 2), ('sad', 1)])
+        self.assertEqual([(facet['label'], facet['count']) for facet in facets['months']],
+                         [('February 2024', 2), ('January 2024', 1)])
+
+        facets = self.client.get(self.url, {'q': 'lake'}).context['facets']
+        self.assertEqual([(facet['label'], facet['count']) for facet in facets['journals']], [('Travel', 1), ('Work', 1)])
+
+    def test_entries_without_a_mood_share_one_facet_that_filters_them(self):
+        self._create_entry(self.work, 'Blank mood', [], '', date(2024, 2, 13))
+        self._create_entry(self.work, 'Null mood', [], None, date(2024, 2, 14))
+        facets = self.client.get(self.url).context['facets']
+        no_mood_facets = [facet for facet in facets['moods'] if facet['label'] == 'No mood']
+        self.assertEqual([(facet['value'], facet['count']) for facet in no_mood_facets], [('none', 2)])
+
+        response = self.client.get(self.url, {'mood': no_mood_facets[0]['value']})
+        self.assertEqual({entry.entry_name for entry in response.context['entry_list']}, {'Blank mood', 'Null mood'})
+
+    def test_query_count_does_not_grow_with_facet_values(self):
+        query_count = self._count_search_queries()
+        for month in range(3, 9):
+            journal = Journal.objects.create(name=f'Journal {month}', owner=self.user)
+            self._create_entry(journal, f'Lake {month}', [], 'neutral', date(2024, month, 1))
+        self.assertEqual(self._count_search_queries(), query_count)
+
+    def test_results_are_paginated(self):
+        seen_names, params = [], {}
+        while True:
+            response = self.client.get(self.url, params)
+            seen_names += [entry.entry_name for entry in response.context['entry_list']]
+            if response.context['next_cursor'] is None:
+                break
+            params = {'after': response.context['next_cursor']}
+            self.assertIsNone(self.client.get(self.url, params).context['facets'])
+        self.assertEqual(seen_names, ['Deadline', 'Mountains', 'Beach day'])
+
+    def _count_search_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {'q': 'lake'})
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def _create_entry(self, journal, name, responses, mood, entry_date):
+        entry = Entry.objects.create(journal=journal, entry_name=name, responses=responses, mood=mood)
+        Entry.objects.filter(pk=entry.pk).update(date=entry_date)
+        return entry
@@ -0,0 +1,100 @@
+"""Tests of the sidebar fragment views."""
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from journals.models import Entry, Journal, User
+
+
+class SidebarViewTestCase(TestCase):
+    """Tests of the sidebar fragment views."""
+
+    fixtures = [
+        'journals/tests/fixtures/default_user.json',
+        'journals/tests/fixtures/other_users.json',
+        'journals/tests/fixtures/default_template_owner.json',
+        'journals/tests/fixtures/default_journals.json',
+        'journals/tests/fixtures/default_entry.json'
+    ]
+
+    def setUp(self):
+        self.user = User.objects.get(username='@johndoe')
+        self.journal = Journal.objects.get(name='Default Journal')
+        self.journals_url = reverse('sidebar_journals')
+        self.entries_url = reverse('sidebar_entries', kwargs={'journal_id': self.journal.id})
+        self.client.login(username=self.user.username, password='Password123')
+
+    def test_sidebar_urls(self):
+        self.assertEqual(self.journals_url, '/sidebar/journals/')
+        self.assertEqual(self.entries_url, f'/sidebar/journals/{self.journal.id}/entries/')
+
+    def test_pages_do_not_load_entries_for_the_sidebar(self):
+        response = self.client.get(reverse('journals_home'))
+        self.assertContains(response, f'data-url="{self.journals_url}"')
+        self.assertNotContains(response, 'Second Entry')
+
+    def test_sidebar_journals_lists_journal_names(self):
+        response = self.client.get(self.journals_url)
+        self.assertEqual(response.status_code, 200)
+        for journal in Journal.objects.filter(owner=self.user):
+            self.assertContains(response, journal.name)
+            self.assertContains(response, reverse('sidebar_entries', kwargs={'journal_id': journal.id}))
+
+    def test_sidebar_journals_is_revalidated_with_etag(self):
+        response = self.client.get(self.journals_url)
+        self.assertIn('private', response['Cache-Control'])
+        response = self.client.get(self.journals_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_unchanged_sidebar_is_revalidated_without_being_rendered(self):
+        journals_etag = self.client.get(self.journals_url)['ETag']
+        entries_etag = self.client.get(self.entries_url)['ETag']
+        # The session, the user and the version of the user's names
+        with self.assertNumQueries(3):
+            response = self.client.get(self.journals_url, HTTP_IF_NONE_MATCH=journals_etag)
+        self.assertEqual(response.status_code, 304)
+        # The journal access check adds the journal and its owner
+        with self.assertNumQueries(5):
+            response = self.client.get(self.entries_url, HTTP_IF_NONE_MATCH=entries_etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], entries_etag)
+
+    def test_sidebar_etag_changes_when_a_name_changes(self):
+        journals_etag = self.client.get(self.journals_url)['ETag']
+        entries_etag = self.client.get(self.entries_url)['ETag']
+        entry = Entry.objects.filter(journal=self.journal).first()
+        entry.entry_name = 'Renamed entry'
+        entry.save()
+        response = self.client.get(self.entries_url, HTTP_IF_NONE_MATCH=entries_etag)
+        self.assertContains(response, 'Renamed entry')
+        response = self.client.get(self.journals_url, HTTP_IF_NONE_MATCH=journals_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_sidebar_etag_differs_between_users(self):
+        journals_etag = self.client.get(self.journals_url)['ETag']
+        self.client.logout()
+        self.client.login(username='@janedoe', password='Password123')
+        response = self.client.get(self.journals_url, HTTP_IF_NONE_MATCH=journals_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_sidebar_entries_lists_entry_names(self):
+        response = self.client.get(self.entries_url)
+        self.assertContains(response, 'First entry')
+        self.assertContains(response, 'Second Entry')
+        self.assertNotContains(response, 'data-more-url')
+
+    @override_settings(SIDEBAR_ENTRIES_PAGE_SIZE=1)
+    def test_sidebar_entries_are_paginated(self):
+        response = self.client.get(self.entries_url)
+        self.assertContains(response, 'First entry')
+        self.assertNotContains(response, 'Second Entry')
+        self.assertContains(response, f'data-more-url="{self.entries_url}?page=2"')
+
+        response = self.client.get(f'{self.entries_url}?page=2')
+        self.assertContains(response, 'Second Entry')
+        self.assertNotContains(response, 'data-more-url')
+
+    def test_sidebar_entries_of_another_users_journal_redirects(self):
+        self.client.logout()
+        other_user = User.objects.get(username='@janedoe')
+        self.client.login(username=other_user.username, password='Password123')
+        response = self.client.get(self.entries_url)
+        self.assertRedirects(response, reverse('journals_home'))
@@ -0,0 +1,94 @@
+"""Tests of the typeahead suggestions view."""
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from journals.models import Entry, Journal, Template, User
+from journals.suggestions import starting_with
+
+
+class SuggestionsViewTestCase(TestCase):
+    """Tests of the typeahead suggestions view."""
+
+    fixtures = ['journals/tests/fixtures/default_user.json',
+                'journals/tests/fixtures/default_template_owner.json']
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.get(username='@johndoe')
+        template = Template.objects.get(name='Base Template')
+        self.journal = Journal.objects.create(name='Morning pages', owner=self.user, template=template)
+        Entry.objects.create(journal=self.journal, entry_name='Monday')
+        self.newest_monday = Entry.objects.create(journal=self.journal, entry_name='Monday')
+        Entry.objects.create(journal=self.journal, entry_name='Tuesday')
+
+        other_user = User.objects.create_user(username='@other', email='other@example.com', password='Password123')
+        Journal.objects.create(name='Mountains', owner=other_user, template=template)
+
+        self.url = reverse('suggestions')
+        self.client.login(username=self.user.username, password="Password123")
+
+    def test_suggestions_url(self):
+        self.assertEqual(self.url, '/journals/suggestions/')
+
+    def test_suggests_own_names_starting_with_the_prefix(self):
+        response = self.client.get(self.url, {'q': 'mo', 'journal': self.journal.id})
+        self.assertEqual(response.json()['suggestions'], [
+            {'type': 'entry', 'id': self.newest_monday.id, 'journal_id': self.journal.id, 'name': 'Monday'},
+            {'type': 'journal', 'id': self.journal.id, 'name': 'Morning pages'},
+        ])
+
+    def test_entry_names_are_only_suggested_within_the_journal(self):
+        other_journal = Journal.objects.create(name='Evening pages', owner=self.user)
+        Entry.objects.create(journal=other_journal, entry_name='Moonrise')
+        response = self.client.get(self.url, {'q': 'mo', 'type': 'entry', 'journal': other_journal.id})
+        self.assertEqual([suggestion['name'] for suggestion in response.json()['suggestions']], ['Moonrise'])
+        response = self.client.get(self.url, {'q': 'mo', 'type': 'entry'})
+        self.assertEqual(response.json()['suggestions'], [])
+
+    def test_entry_names_of_another_users_journal_are_not_suggested(self):
+        other_journal = Journal.objects.get(name='Mountains')
+        Entry.objects.create(journal=other_journal, entry_name='Moonrise')
+        response = self.client.get(self.url, {'q': 'mo', 'type': 'entry', 'journal': other_journal.id})
+        self.assertEqual(response.json()['suggestions'], [])
+
+    def test_suggestions_can_be_limited_to_one_type(self):
+        response = self.client.get(self.url, {'q': 'MO', 'type': 'journal'})
+        self.assertEqual([suggestion['name'] for suggestion in response.json()['suggestions']], ['Morning pages'])
+
+    def test_empty_prefix_has_no_suggestions(self):
+        response = self.client.get(self.url, {'q': ''})
+        self.assertEqual(response.json()['suggestions'], [])
+
+    def test_cached_names_are_reused_and_refreshed_on_rename(self):
+        self.client.get(self.url, {'q': 'tu', 'journal': self.journal.id})
+        # The session, the user and the version of the user's names
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {'q': 'tu', 'journal': self.journal.id})
+
+        entry = Entry.objects.get(entry_name='Tuesday')
+        entry.entry_name = 'Thursday'
+        entry.save()
+        response = self.client.get(self.url, {'q': 't', 'journal': self.journal.id})
+        self.assertEqual([suggestion['name'] for suggestion in response.json()['suggestions']], ['Thursday'])
+
+    def test_unchanged_suggestions_are_not_modified(self):
+        response = self.client.get(self.url, {'q': 'mo'})
+        response = self.client.get(self.url, {'q': 'mo'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_names_are_matched_without_regard_to_case(self):
+        Entry.objects.create(journal=self.journal, entry_name='ÉCOLE day')
+        response = self.client.get(self.url, {'q': 'éco', 'type': 'entry', 'journal': self.journal.id})
+        self.assertEqual([suggestion['name'] for suggestion in response.json()['suggestions']], ['ÉCOLE day'])
+
+    def test_renamed_entry_keeps_its_lowercased_name_current(self):
+        entry = Entry.objects.get(entry_name='Tuesday')
+        entry.entry_name = 'Wednesday'
+        entry.save(update_fields=['entry_name'])
+        self.assertEqual(Entry.objects.get(pk=entry.pk).entry_name_lower, 'wednesday')
+
+    def test_entry_lookup_uses_the_journal_name_index(self):
+        entries = Entry.objects.filter(journal=self.journal, **starting_with('entry_name_lower', 'mo'))
+        self.assertIn('entry_journal_name_idx', entries.explain())
+        journals = Journal.objects.filter(owner=self.user, **starting_with('name_lower', 'mo'))
+        self.assertIn('journal_owner_name_idx', journals.explain())
@@ -1,35 +1,36 @@
-import os
+from calendar import monthrange
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login, logout
 
 from django.contrib.auth.mixins import LoginRequiredMixin, AccessMixin
 from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import Paginator
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.shortcuts import redirect, render, get_object_or_404
 from django.views import View
 from django.views.generic.edit import FormView, UpdateView
 from django.urls import reverse
-from journals.forms import CustomTemplateForm, LogInForm, PasswordForm, SearchForm, UserForm, SignUpForm, ProfilePicForm
-from journals.helpers import is_custom_template, login_prohibited, redirect_to_custom_template_view
-from journals.models import Journal, Entry, Profile
+from journals.forms import CustomTemplateForm, EntrySearchForm, LogInForm, PasswordForm, SearchForm, UserForm, SignUpForm, ProfilePicForm
+from journals.helpers import get_cacheable_fragment_response, get_entries_page, get_versioned_fragment_response, get_ranged_file_response, is_custom_template, login_prohibited, redirect_to_custom_template_view
+from journals import recently_accessed
+from journals.archive import get_archive_filename, get_archive_fingerprint, get_saved_archive_path, stream_archive
+from journals.exports import get_or_start_journal_export
+from journals.pdf_cache import get_entry_pdf_key, get_entry_pdf_path
+from journals.suggestions import get_names_version, get_suggestions
+from journals.search import can_search, filter_matching_entries, get_search_facets, search_entries
+from journals.leaderboard import get_rank, get_top_profiles
+from journals.models import Journal, JournalExport, Entry, Profile
 from journals.forms import CreateNewJournal, EditEntryForm, MoodTrackerForm
 from django.views.generic import DetailView
 
-from django.http import HttpResponse, HttpResponseRedirect
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from journals.models import Entry, Journal
-import io
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.platypus import Paragraph
-from reportlab.platypus import Spacer
-from reportlab.platypus import Image
 from django.utils import timezone
 
-from reportlab.lib.styles import getSampleStyleSheet
 
+from django.utils.http import content_disposition_header
 from django.utils.text import slugify
 import uuid
 
@@ -107,25 +108,26 @@ class DashboardView(LoginRequiredMixin, View):
 
     def get(self, request):
         current_user = self.request.user
-        profile = Profile.objects.get(user=current_user)
+        profile = Profile.objects.select_related('top_achievement').get(user=current_user)
         recently_accessed_journals = current_user.get_recently_accessed_journals()
+        journals_with_today_entry, journals_without_today_entry = current_user.get_journals_grouped_by_today_entry()
         experience_needed = profile.required_experience_for_next_level()
         progress_to_next_level = (profile.experience / experience_needed) * 100 if experience_needed > 0 else 0
         
-        top_users = Profile.objects.order_by('-level', '-experience')[:10]
+        top_users = get_top_profiles()
         in_top_users = profile in top_users
 
         # Calculate rank if not in top_users
         if not in_top_users:
-            all_profiles = Profile.objects.order_by('-level', '-experience')
-            ranks = {profile.id: rank for rank, profile in enumerate(all_profiles, start=1)}
-            current_user_rank = ranks.get(profile.id)
+            current_user_rank = get_rank(profile)
         else:
             current_user_rank = None
 
         context = {
             'user': current_user,
             'journal_list': recently_accessed_journals,
+            'has_journals': bool(journals_with_today_entry or journals_without_today_entry),
+            'journals_without_today_entry': journals_without_today_entry,
             'level': profile.level,
             'current_experience': profile.experience,
             'experience_needed': experience_needed,
@@ -134,6 +136,7 @@ class DashboardView(LoginRequiredMixin, View):
             'top_users': top_users,
             'in_top_users': in_top_users,
             'current_user_rank': current_user_rank,
+            'profile': profile,
         }
         
         return render(self.request, 'dashboard.html', context)
@@ -225,27 +228,73 @@ class JournalsView(LoginRequiredMixin, View):
     template_name = 'journals_base.html'
     http_method_names = ['get']
     def get(self,request):
-        journal_list = request.user.get_associated_journals()
+        journal_list = request.user.get_associated_journals().with_card_stats()
         return render(request, "journals_base.html", {"journal_list": journal_list})
 
+class SidebarJournalsView(LoginRequiredMixin, View):
+    """Display the journal names of the sidebar, which each page loads separately"""
+    http_method_names = ['get']
+
+    def get(self, request):
+        def render_fragment():
+            journal_list = request.user.get_associated_journals().only('id', 'name')
+            return render(request, 'partials/sidebar_journals.html', {'journal_list': journal_list})
+
+        etag = f'sidebar-journals:{request.user.pk}:{get_names_version(request.user.pk)}'
+        return get_versioned_fragment_response(request, etag, render_fragment)
+
+class SidebarEntriesView(LoginRequiredMixin, JournalAndEntryAccessMixin, View):
+    """Display one page of entry names for a journal expanded in the sidebar"""
+    http_method_names = ['get']
+
+    def get(self, request, journal_id):
+        def render_fragment():
+            entries = Entry.objects.filter(journal_id=journal_id).only('id', 'entry_name', 'date').order_by('-date', '-id')
+            page_obj = Paginator(entries, settings.SIDEBAR_ENTRIES_PAGE_SIZE).get_page(request.GET.get('page'))
+            return render(request, 'partials/sidebar_entries.html', {'page_obj': page_obj, 'journal_id': journal_id})
+
+        etag = f'sidebar-entries:{request.user.pk}:{get_names_version(request.user.pk)}'
+        return get_versioned_fragment_response(request, etag, render_fragment)
+
+class SuggestionsView(LoginRequiredMixin, View):
+    """Suggest the journal names, and the entry names of the given journal, starting with what the user has typed"""
+    http_method_names = ['get']
+
+    def get(self, request):
+        suggestion_type = request.GET.get('type')
+        if suggestion_type not in ('journal', 'entry'):
+            suggestion_type = None
+        try:
+            journal_id = int(request.GET['journal'])
+        except (KeyError, ValueError):
+            journal_id = None
+        suggestions = get_suggestions(request.user, request.GET.get('q'), suggestion_type, journal_id)
+        response = JsonResponse({'suggestions': suggestions})
+        return get_cacheable_fragment_response(request, response)
+
 class EntriesView(LoginRequiredMixin, JournalAndEntryAccessMixin, View):
-    """Display the journals entries"""
+    """Display the journals entries, one page at a time"""
     template_name = 'entries_base.html'
     http_method_names = ['get', 'post']
     def get(self,request,journal_id):
         
         journal = Journal.objects.get(id=journal_id)
-        entry_list = journal.get_entries()
         self.request.user.add_to_journals_recently_accessed(journal)
-        streak = journal.get_streak()
         form = SearchForm(
             model=Entry,
             model_name_field="entry_name",
             model_foreign_key="journal",
             model_foreign_key_value=journal
         )
+        entry_list, next_cursor = get_entries_page(journal.get_entries(), request.GET.get('after'))
       
-        return render(request, 'view_journal_entries.html', {"form": form, "entry_list": entry_list, 'journal': journal})
+        return render(request, 'view_journal_entries.html', {
+            "form": form,
+            "entry_list": entry_list,
+            "entry_count": journal.get_number_of_entries(),
+            "next_cursor": next_cursor,
+            'journal': journal,
+        })
 
     def post(self, request, journal_id):
         journal = Journal.objects.get(id=journal_id)
@@ -257,8 +306,75 @@ class EntriesView(LoginRequiredMixin, JournalAndEntryAccessMixin, View):
             data=self.request.POST
         )
         
-        entry_list = form.get_filtered_results()
-        return render(request, 'view_journal_entries.html', {"form": form, "entry_list": entry_list, 'journal': journal})
+        search_name = form.cleaned_data.get('search_name', '') if form.is_valid() else ''
+        if can_search(search_name):
+            entry_list, next_cursor = search_entries(journal.entries.all(), search_name, request.POST.get('after'))
+            entry_count = filter_matching_entries(journal.entries.all(), search_name).count()
+        else:
+            filtered_entries = form.get_filtered_results()
+            if filtered_entries is None:
+                filtered_entries = Entry.objects.none()
+            entry_list, next_cursor = get_entries_page(filtered_entries, request.POST.get('after'))
+            entry_count = filtered_entries.count()
+        return render(request, 'view_journal_entries.html', {
+            "form": form,
+            "entry_list": entry_list,
+            "entry_count": entry_count,
+            "next_cursor": next_cursor,
+            "search_name": search_name,
+            'journal': journal,
+        })
+
+class SearchEntriesView(LoginRequiredMixin, View):
+    """Search the entries of all of the user's journals"""
+
+    http_method_names = ['get']
+
+    def get(self, request):
+        form = EntrySearchForm(request.user, data=request.GET)
+        entries = Entry.objects.filter(journal__owner=request.user).select_related('journal')
+        query = ''
+        if form.is_valid():
+            query = form.cleaned_data['q']
+            entries = form.filter_entries(entries)
+        else:
+            entries = entries.none()
+
+        cursor = request.GET.get('after')
+        if can_search(query):
+            entry_list, next_cursor = search_entries(entries, query, cursor)
+            entries = filter_matching_entries(entries, query)
+        else:
+            entry_list, next_cursor = get_entries_page(entries, cursor)
+
+        # Counts only change with the filters, so later pages skip the aggregate.
+        facets = None if cursor else get_search_facets(entries)
+        if facets:
+            for facet in facets['journals']:
+                facet['query'] = self._get_query(journal=facet['value'])
+            for facet in facets['moods']:
+                facet['query'] = self._get_query(mood=facet['value'])
+            for facet in facets['months']:
+                last_day = monthrange(facet['value'].year, facet['value'].month)[1]
+                facet['query'] = self._get_query(
+                    start_date=facet['value'].isoformat(),
+                    end_date=facet['value'].replace(day=last_day).isoformat()
+                )
+        return render(request, 'search_entries.html', {
+            "form": form,
+            "entry_list": entry_list,
+            "facets": facets,
+            "next_cursor": next_cursor,
+            "next_page_query": self._get_query(after=next_cursor or ''),
+        })
+
+    def _get_query(self, **params):
+        query = self.request.GET.copy()
+        query.pop('after', None)
+        for name, value in params.items():
+            query[name] = value
+        return query.urlencode()
+
 
 class CreateJournalView(LoginRequiredMixin, View):
     """Display the create_journal screen and handle journal creations"""
@@ -266,7 +382,7 @@ class CreateJournalView(LoginRequiredMixin, View):
     http_method_names = ['get', 'post']
     def get(self,request):
         form = CreateNewJournal(user=request.user)
-        journal_list = request.user.get_associated_journals()
+        journal_list = request.user.get_associated_journals().with_card_stats()
         return render(request, "create_journal.html", {"form": form, "journal_list": journal_list})
 
     def post(self,request):
@@ -467,9 +583,7 @@ class DeleteJournalView(LoginRequiredMixin, JournalAndEntryAccessMixin, View):
         # Check if the current user owns the journal
         if request.user == journal.owner:
             journal.delete()
-            if journal_id in self.request.user.recently_accessed_journals:
-                self.request.user.recently_accessed_journals.remove(journal_id)
-                self.request.user.save()
+            recently_accessed.remove_journal_ids(self.request.user, [journal_id])
 
             messages.add_message(self.request, messages.SUCCESS, "Journal deleted!")
         else:
@@ -518,138 +632,85 @@ class ViewEntryView(LoginRequiredMixin, JournalAndEntryAccessMixin, View):
         })
 
 class DownloadEntryPDF(LoginRequiredMixin, JournalAndEntryAccessMixin, View):
-    def get(self, request, journal_id, entry_id):
-
-        journal = get_object_or_404(Journal, id=journal_id)
-        entry = get_object_or_404(Entry, id=entry_id, journal=journal)
-
-        title = entry.entry_name
-        date = entry.date
-        mood = entry.mood
-        questions_and_responses = list(zip(journal.template.questions, entry.responses))
-
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-   
-        styles = getSampleStyleSheet()
-        NormalTextStyle = styles['Normal']
-
-        title_style = ParagraphStyle(name='Title', fontName='Helvetica-Bold', fontSize=16)
-        elements.append(Paragraph(title, title_style))
-        elements.append(Spacer(1, 12))
-        elements.append(Paragraph(f"Date: {date}", NormalTextStyle))
-        elements.append(Spacer(1, 6))
-        elements.append(Paragraph(f"Mood: {mood}", NormalTextStyle))
-        elements.append(Spacer(1, 12))
+    """Download the entry as a PDF, rendered once and then served from the on-disk cache"""
+    http_method_names = ['get']
 
-        
+    def get(self, request, journal_id, entry_id):
+        entry = get_object_or_404(Entry.objects.select_related('journal__template'), id=entry_id, journal_id=journal_id)
+        questions = entry.journal.template.questions if entry.journal.template else []
+        key = get_entry_pdf_key(entry, questions)
+        etag = f'"{key}"'
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = FileResponse(
+            open(get_entry_pdf_path(entry, questions, key), 'rb'),
+            as_attachment=True,
+            filename=f'entry_{entry_id}.pdf',
+            content_type='application/pdf'
+        )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
-        data = [['Question', 'Response']]
-        for question, response in questions_and_responses:
-            data.append([question, response])
 
-        
+class DownloadJournalPDF(LoginRequiredMixin, JournalAndEntryAccessMixin, View):
+    """Download the journal as a PDF, exporting it in the background if it changed since the last export"""
+    http_method_names = ['get']
 
-        table = Table(data)
-        table.setStyle(TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.gray),
-                                   ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                                   ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                                   ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                                   ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                                   ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                                   ('GRID', (0, 0), (-1, -1), 1, colors.black)]))
+    def get(self, request, journal_id):
+        journal = get_object_or_404(Journal.objects.select_related('template'), id=journal_id)
+        export = get_or_start_journal_export(journal, request.user)
+        if export.status == JournalExport.DONE:
+            return get_journal_export_response(export)
+        return redirect('journal_export', journal_id=journal.id, export_id=export.id)
 
-        elements.append(table)
 
-        if entry.multimedia_file:
+class JournalExportView(LoginRequiredMixin, JournalAndEntryAccessMixin, View):
+    """Display the progress of a journal PDF export and link to the file once it is ready"""
+    http_method_names = ['get']
 
-            _, file_extension = os.path.splitext(entry.multimedia_file.name)
+    def get(self, request, journal_id, export_id):
+        export = get_object_or_404(JournalExport.objects.select_related('journal'), id=export_id, journal_id=journal_id)
+        return render(request, 'journal_export.html', {'export': export, 'journal': export.journal})
 
-            if file_extension.lower() != ".mp4":
-                elements.append(Spacer(1, 20))
-                elements.append(Image(entry.multimedia_file.path, width=300, height=300))
-                elements.append(Spacer(1, 20))
-                        
-        doc.build(elements)
 
-        buffer.seek(0)
+class DownloadJournalExportView(LoginRequiredMixin, JournalAndEntryAccessMixin, View):
+    """Stream the PDF of a finished journal export"""
+    http_method_names = ['get']
 
-        response = HttpResponse(buffer.read(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="entry_{entry_id}.pdf"'
+    def get(self, request, journal_id, export_id):
+        export = get_object_or_404(JournalExport, id=export_id, journal_id=journal_id, status=JournalExport.DONE)
+        return get_journal_export_response(export)
 
-        return response
 
-class PDFGeneratorMixin:
-    def generate_pdf(self, elements, filename):
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
+def get_journal_export_response(export):
+    return FileResponse(
+        export.file.open('rb'),
+        as_attachment=True,
+        filename=f'journal_{export.journal_id}_entries.pdf',
+        content_type='application/pdf'
+    )
 
-        doc.build(elements)
 
-        buffer.seek(0)
+class DownloadArchiveView(LoginRequiredMixin, View):
+    """Download a ZIP archive of all of the user's journals and entries.
 
-        response = HttpResponse(buffer.read(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    The first download of an archive streams it as it is generated; once that has finished the
+    saved archive is served instead, with support for resuming through Range requests.
+    """
+    http_method_names = ['get']
 
+    def get(self, request):
+        fingerprint = get_archive_fingerprint(request.user)
+        archive_path = get_saved_archive_path(request.user, fingerprint)
+        filename = get_archive_filename(request.user)
+        if archive_path:
+            return get_ranged_file_response(request, archive_path, filename, 'application/zip', f'"{fingerprint}"')
+
+        response = StreamingHttpResponse(stream_archive(request.user, fingerprint), content_type='application/zip')
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        patch_cache_control(response, private=True, no_cache=True)
         return response
-
-    def add_entry_details(self, elements, entry):
-        title_style = ParagraphStyle(name='Title', fontName='Helvetica-Bold', fontSize=16)
-        elements.append(Paragraph(entry.entry_name, title_style))
-        elements.append(Spacer(1, 6))
-        elements.append(Paragraph(f"Date: {entry.date}", self.normal_text_style()))
-        elements.append(Spacer(1, 6))
-        elements.append(Paragraph(f"Mood: {entry.mood}", self.normal_text_style()))
-        elements.append(Spacer(1, 12))
-
-        data = [['Question', 'Response']]
-        for question, response in zip(entry.journal.template.questions, entry.responses):
-            data.append([question, response])
-
-        table = Table(data)
-        table.setStyle(TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.gray),
-                                   ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                                   ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                                   ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                                   ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                                   ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                                   ('GRID', (0, 0), (-1, -1), 1, colors.black)]))
-        elements.append(table)
-
-        if entry.multimedia_file:
-            _, file_extension = os.path.splitext(entry.multimedia_file.name)
-            if file_extension.lower() != ".mp4":
-                elements.append(Spacer(1, 20))
-                elements.append(Image(entry.multimedia_file.path, width=300, height=300))
-                elements.append(Spacer(1, 20))
-
-    def normal_text_style(self):
-        styles = getSampleStyleSheet()
-        return styles['Normal']
-
-
-class DownloadEntryPDF(LoginRequiredMixin, PDFGeneratorMixin, JournalAndEntryAccessMixin, View):
-    def get(self, request, journal_id, entry_id):
-        journal = get_object_or_404(Journal, id=journal_id)
-        entry = get_object_or_404(Entry, id=entry_id, journal=journal)
-
-        elements = []
-        self.add_entry_details(elements, entry)
-
-        return self.generate_pdf(elements, f'entry_{entry_id}.pdf')
-
-
-class DownloadJournalPDF(LoginRequiredMixin, PDFGeneratorMixin, JournalAndEntryAccessMixin, View):
-    def get(self, request, journal_id):
-        journal = get_object_or_404(Journal, id=journal_id)
-        entries = Entry.objects.filter(journal=journal)
-        journal_title = journal.name
-
-        elements = [Paragraph(journal_title, self.normal_text_style()), Spacer(1, 12)]
-
-        for entry in entries:
-            self.add_entry_details(elements, entry)
-            elements.append(Spacer(1, 24))  # Add some space between entries
-
-        return self.generate_pdf(elements, f'journal_{journal_id}_entries.pdf')
\ No newline at end of file